@@ -1,37 +1,46 @@
 import os
-import pandas as pd
+import sys
 import chromadb
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.chroma_sync import sync_collection
+from rag_utils.csv_ingest import iter_csv_rows
+
 # === Step 1: Setup Chroma client ===
 client = chromadb.PersistentClient(path="./chroma_db_csv")
 collection = client.get_or_create_collection(name="csv_vectors")
 
 # === Step 2: Load CSV file ===
 file_path = "sample.csv"  # <- replace with your CSV file path
-df = pd.read_csv(file_path)
-
-print(f"✅ CSV file loaded with {len(df)} rows and {len(df.columns)} columns.")
 
 # === Step 3: Combine text from multiple columns ===
-# You can choose which columns to use
-# Example: take all columns and join them as text
-def row_to_text(row):
-    return " | ".join(str(v) for v in row.values if pd.notna(v))
+# You can choose which columns to use (None = all columns) and which to keep as metadata
+TEXT_COLUMNS = None
+METADATA_COLUMNS = []
 
-documents = df.apply(row_to_text, axis=1).tolist()
-print(f"✅ Created {len(documents)} text documents from CSV rows.")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
 
 # === Step 4: Create embeddings and store in Chroma ===
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(documents)
-
-collection.add(
-    documents=documents,
-    embeddings=embeddings,
-    ids=[f"row_{i}" for i in range(len(documents))]
-)
-
+# The CSV is streamed in chunks of rows (CSV_CHUNK_ROWS); each row's non-empty values are
+# joined as "v1 | v2 | ..." column-wise. Rows already in the collection (same content)
+# are not embedded again; removed rows are deleted.
+def csv_records():
+    for batch in iter_csv_rows(file_path, text_columns=TEXT_COLUMNS,
+                               metadata_columns=METADATA_COLUMNS, with_names=False):
+        for j, (row, text) in enumerate(zip(batch.rows, batch.texts)):
+            metadata = None
+            if batch.metadata:
+                # Chroma metadata values can't be None
+                metadata = {k: v for k, v in batch.metadata[j].items() if v is not None} or {"row": int(row)}
+            yield text, metadata
+
+
+stats = sync_collection(collection, model, EMBED_MODEL, csv_records(), prefix="row")
+
+print(f"✅ {stats['total']} text documents from CSV rows "
+      f"({stats['added']} added, {stats['unchanged']} unchanged, {stats['deleted']} removed).")
 print("✅ CSV data successfully converted to Chroma vector database!")
 
 # === Step 5: Query function ===
@@ -1,8 +1,13 @@
 import os
-import fitz  # PyMuPDF
+import sys
 import chromadb
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.chroma_sync import sync_collection
+from rag_utils.pdf_ingest import iter_pdf_pages
+from rag_utils.chunking import iter_chunks
+
 # === Step 1: Setup Chroma client ===
 client = chromadb.PersistentClient(path="./chroma_db_pdf")
 collection = client.get_or_create_collection(name="pdf_vectors")
@@ -10,33 +15,26 @@ collection = client.get_or_create_collection(name="pdf_vectors")
 # === Step 2: Load and extract text from PDF ===
 file_path = "sample.pdf"  # <- Replace with your PDF file path
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    with fitz.open(pdf_path) as pdf:
-        for page in pdf:
-            text += page.get_text()
-    return text
-
-text = extract_text_from_pdf(file_path)
+# === Step 3: Split pages into chunks sized by the model's tokenizer ===
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
+
+# Pages are extracted in parallel (PDF_WORKERS processes) and chunked as they arrive;
+# each chunk remembers its page and character span on that page
+chunks = []
+chunk_meta = []
+for page_no, page_text in iter_pdf_pages(file_path):
+    for c in iter_chunks(page_text, model):
+        chunks.append(page_text[c.start:c.end])
+        chunk_meta.append({"page": page_no, "start": c.start, "end": c.end})
 print("PDF text extracted successfully!")
-
-# === Step 3: Split text into chunks ===
-def chunk_text(text, chunk_size=300):
-    words = text.split()
-    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-
-chunks = chunk_text(text)
 print(f"Total chunks created: {len(chunks)}")
 
 # === Step 4: Generate embeddings and store in Chroma ===
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(chunks)
-
-collection.add(
-    documents=chunks,
-    embeddings=embeddings,
-    ids=[f"chunk_{i}" for i in range(len(chunks))]
-)
+# Only new / changed chunks are embedded and upserted; chunks gone from the PDF are deleted
+stats = sync_collection(collection, model, EMBED_MODEL, zip(chunks, chunk_meta), prefix="chunk")
+print(f"Added {stats['added']} chunks ({stats['unchanged']} unchanged, "
+      f"{stats['deleted']} removed)")
 
 print("PDF data successfully converted to Chroma vector database!")
 
@@ -48,8 +46,8 @@ def query_chroma(user_query, n_results=3):
         n_results=n_results
     )
     print("\nQuery Results:")
-    for i, doc in enumerate(results['documents'][0]):
-        print(f"{i+1}. {doc[:300]}...\n")  # show first 300 chars
+    for i, (doc, meta) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
+        print(f"{i+1}. (page {meta.get('page')}) {doc[:300]}...\n")  # show first 300 chars
 
 # === Step 6: Run a query ===
 user_query = input("\nAsk your query: ")
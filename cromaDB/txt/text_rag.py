@@ -1,8 +1,13 @@
 import os
+import sys
 import chromadb
 from chromadb.utils import embedding_functions
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.chroma_sync import sync_collection
+from rag_utils.chunking import chunk_text
+
 # === Step 1: Setup ===
 # Initialize Chroma client (stores data in ./chroma_db directory)
 client = chromadb.PersistentClient(path="./chroma_db")
@@ -15,25 +20,21 @@ file_path = "sample.txt"   # <- replace with your .txt file path
 with open(file_path, "r", encoding="utf-8") as f:
     text = f.read()
 
-# === Step 3: Split text into smaller chunks ===
-def chunk_text(text, chunk_size=300):
-    words = text.split()
-    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+# === Step 3: Split text into chunks sized by the model's tokenizer ===
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
 
-chunks = chunk_text(text)
+chunks = chunk_text(text, model)
 print(f"Total chunks created: {len(chunks)}")
 
 # === Step 4: Create embeddings and store in Chroma ===
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-embeddings = model.encode(chunks)
 
-# Add to Chroma collection
-collection.add(
-    documents=chunks,
-    embeddings=embeddings,
-    ids=[f"chunk_{i}" for i in range(len(chunks))]
-)
+# Ids are content hashes: chunks already in the collection are not embedded again,
+# new ones are upserted in batches and chunks removed from the file are deleted
+stats = sync_collection(collection, model, EMBED_MODEL, ((chunk, None) for chunk in chunks),
+                        prefix="chunk")
+print(f"Added {stats['added']} chunks ({stats['unchanged']} unchanged, "
+      f"{stats['deleted']} removed)")
 
 print("Text data successfully converted to Chroma vector database!")
 
@@ -1,10 +1,14 @@
 import os
+import sys
 import csv
-import faiss
-import numpy as np
 from sentence_transformers import SentenceTransformer
 from openai import OpenAI
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.embedding_cache import cached_encode
+from rag_utils import index_factory, similarity, batch_query
+from rag_utils.answer_cache import AnswerCache
+
 from dotenv import load_dotenv
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -24,39 +28,57 @@ with open("data.csv", "r", encoding="utf-8") as f:
         questions.append(q)
 
 # Encode questions
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(questions, convert_to_numpy=True)
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
+embeddings = cached_encode(model, EMBED_MODEL, questions)
 
 # Create FAISS index
-dim = embeddings.shape[1]
-index = faiss.IndexFlatL2(dim)
-index.add(embeddings)
+# Normalized vectors in an inner-product index: search scores are cosines.
+# Flat / IVF / HNSW is picked by corpus size (override with FAISS_INDEX_TYPE)
+index = similarity.build_cosine_index(embeddings)
+index_factory.print_index_report(index, similarity.normalize(embeddings), metric="ip")
+
+# Cosine threshold, calibrated per model (rag_utils/similarity_thresholds.json)
+THRESHOLD = similarity.get_threshold(EMBED_MODEL, "faiss_csv", default=0.83)
 
 # Function to query FAISS
 def query_data_csv(query, k=1):
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    distances, indices = index.search(query_embedding, k)
-    
-    best_idx = indices[0][0]
-    best_dist = distances[0][0]
-    
-    # Compute similarity score (smaller distance = more similar)
-    similarity_score = 1 / (1 + best_dist)  # convert L2 distance to 0–1 scale
-    
-    # Threshold for similarity confidence
-    if similarity_score > 0.75:
-        q, a = qa_pairs[best_idx]
-        return f"Q: {q}\nA: {a}"
-    else:
+    match = query_data_csv_batch([query], k)[0]
+    if match["question"] is None:
         return None
+    return f"Q: {match['question']}\nA: {match['answer']}"
+
+# Many queries at once: one encode call and one multi-row FAISS search
+def query_data_csv_batch(queries, k=1):
+    query_embeddings = model.encode(queries, convert_to_numpy=True)
+    scores, indices = similarity.cosine_search(index, query_embeddings, k)
+
+    results = []
+    for row_scores, row_ids in zip(scores, indices):
+        best_idx = row_ids[0]
+        similarity_score = float(row_scores[0])  # cosine similarity
+
+        # Threshold for similarity confidence
+        if best_idx >= 0 and similarity_score > THRESHOLD:
+            q, a = qa_pairs[best_idx]
+        else:
+            q, a = None, None
+        results.append({"question": q, "answer": a, "score": similarity_score})
+    return results
+
+# Repeated questions reuse the earlier ChatGPT answer (semantic reuse via ANSWER_CACHE_SEMANTIC_THRESHOLD)
+CHAT_MODEL = "gpt-4o"
+answer_cache = AnswerCache(embed_fn=lambda q: model.encode(q, convert_to_numpy=True))
 
 # Function to query ChatGPT
 def query_chatgpt(prompt):
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content
+    def ask():
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
+    return answer_cache.get_or_compute(prompt, ask, context=CHAT_MODEL)
 
 # Main function
 def hybrid_query(query):
@@ -68,8 +90,27 @@ def hybrid_query(query):
         chat_response = query_chatgpt(query)
         return f"[From ChatGPT]: {chat_response}"
 
+# Batch version of hybrid_query; ChatGPT is only called for misses if fallback=True
+def hybrid_query_batch(queries, fallback=False):
+    results = query_data_csv_batch([q.strip().lower() for q in queries])
+    for query, result in zip(queries, results):
+        result["source"] = "data.csv" if result["answer"] is not None else None
+        if result["source"] is None and fallback:
+            result["answer"] = query_chatgpt(query.strip().lower())
+            result["source"] = "chatgpt"
+    return results
+
 # Example usage
 if __name__ == "__main__":
+    parser = batch_query.batch_arg_parser("Query data.csv with FAISS (+ ChatGPT fallback)")
+    parser.add_argument("--fallback", action="store_true",
+                        help="in batch mode, ask ChatGPT for queries with no local match")
+    args = parser.parse_args()
+    if args.batch:
+        batch_query.run_batch(args.batch, args.output,
+                              lambda qs: hybrid_query_batch(qs, args.fallback), args.chunk_size)
+        raise SystemExit
+
     while True:
         user_query = input("Ask something: ")
         if user_query.lower() in ["exit", "quit"]:
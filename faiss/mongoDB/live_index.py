@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import threading
+import faiss
+from pymongo.errors import PyMongoError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils import index_factory
+from trainings_sync import doc_to_text, DOC_FIELDS
+
+# Seconds between index copies under a steady stream of writes (see _publish)
+PUBLISH_INTERVAL = float(os.getenv("LIVE_PUBLISH_INTERVAL", "5"))
+
+
+# ================= READ-COPY-UPDATE INDEX =================
+# The writer applies changes to its private TrainingsIndex, then publishes a
+# fresh copy of the FAISS index with a single reference assignment. Queries
+# search whatever copy is current and read records from the WAL-mode
+# metadata store, so they never wait on ingestion.
+# A copy costs O(index size), so applied batches are published together, at most
+# once per publish_interval; the watcher publishes leftovers once writes go quiet.
+class LiveTrainingsIndex:
+    def __init__(self, store, embedder, to_text=doc_to_text, fields=DOC_FIELDS,
+                 publish_interval=PUBLISH_INTERVAL):
+        self.store = store
+        self.embedder = embedder
+        self.to_text = to_text
+        self.fields = fields
+        self.publish_interval = publish_interval
+        self._write_lock = threading.Lock()  # serializes writers only
+        self._publish()
+
+    def _publish(self):
+        index = self.store.index
+        self.snapshot = faiss.clone_index(index) if index is not None else None
+        self._unpublished = False
+        self._published_at = time.monotonic()
+
+    # Publishes applied changes if the last copy is older than publish_interval
+    def publish(self, force=False):
+        with self._write_lock:
+            self._publish_due(force)
+
+    def _publish_due(self, force=False):
+        if self._unpublished and (
+                force or time.monotonic() - self._published_at >= self.publish_interval):
+            self._publish()
+
+    def apply(self, docs, deleted_ids):
+        with self._write_lock:
+            stats = self.store.apply(docs, deleted_ids, self.embedder, self.to_text)
+            if stats["added"] or stats["updated"] or stats["removed"]:
+                self._unpublished = True
+                self._publish_due()
+            return stats
+
+    def resync(self, collection):
+        with self._write_lock:
+            stats = self.store.sync(collection, self.embedder, self.to_text, self.fields)
+            if stats["added"] or stats["updated"] or stats["removed"]:
+                self._publish()
+            return stats
+
+    def save(self, index_path):
+        with self._write_lock:
+            self.store.save(index_path)
+
+    # filters (see training_filters.parse_filters) restrict the search to the
+    # matching vector ids before FAISS scores anything
+    def search(self, query_emb, k=5, filters=None):
+        index = self.snapshot
+        if index is None or index.ntotal == 0:
+            return []
+        eligible = self.store.metadata.filter_vids(filters) if filters else None
+        _, ids = index_factory.search(index, query_emb, min(k, index.ntotal), ids=eligible)
+        return self.store.metadata.get_many(i for i in ids[0] if i >= 0)
+
+
+# ================= CHANGE WATCHER =================
+# Tails a MongoDB change stream and feeds batched changes into the live index.
+# Standalone mongod (no replica set) and mongomock don't support change
+# streams, so it falls back to a periodic hash-based rescan.
+# Events that end the stream (drop / rename / invalidate) and batches that
+# fail to apply (e.g. an embedding error) are recovered with a full rescan.
+INVALIDATING_OPS = ("drop", "rename", "dropDatabase", "invalidate")
+
+
+class ChangeWatcher(threading.Thread):
+    def __init__(self, live, collection, batch_window=1.0, poll_interval=30.0):
+        super().__init__(daemon=True)
+        self.live = live
+        self.collection = collection
+        self.batch_window = batch_window
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._stop_event = threading.Event()
+        self._needs_resync = False
+        self._last_resync = 0.0
+        self._stream = None
+
+    def stop(self):
+        self._stop_event.set()
+        if self._stream is not None and not self.is_alive():
+            self._stream.close()  # opened but never started
+            self._stream = None
+
+    # Opens the change stream. Call it before the initial sync: changes made while the
+    # sync runs are buffered by the stream and applied once the thread starts
+    # (re-applying a document the sync already saw is a no-op).
+    def open(self):
+        if self.mode is not None:
+            return self.mode
+        try:
+            self._stream = self.collection.watch(self._pipeline(), full_document="updateLookup")
+            self.mode = "change_stream"
+        except (PyMongoError, NotImplementedError, TypeError) as e:
+            # TypeError: mongomock has no watch() at all
+            print(f"⚠️  Change streams unavailable ({e.__class__.__name__}); "
+                  f"polling every {self.poll_interval}s")
+            self.mode = "polling"
+        return self.mode
+
+    def run(self):
+        if self.open() == "polling":
+            self._poll()
+            return
+        stream, self._stream = self._stream, None
+        self._watch(stream)
+
+    def _watch(self, stream):
+        while not self._stop_event.is_set():
+            invalidated = False
+            resume_token = None
+            if stream is not None:
+                with stream:
+                    upserts, deletes = {}, set()
+                    window_start = None
+                    try:
+                        while not self._stop_event.is_set() and stream.alive:
+                            change = stream.try_next()
+                            if change is not None and change["operationType"] in INVALIDATING_OPS:
+                                invalidated = True
+                                break
+                            if change is not None:
+                                window_start = window_start or time.monotonic()
+                                self._collect(change, upserts, deletes)
+                            elif window_start is None:
+                                self._retry_resync()
+                                self.live.publish()
+                                time.sleep(0.1)
+
+                            # Flush a batch once the window has elapsed
+                            if window_start and time.monotonic() - window_start >= self.batch_window:
+                                self._flush(upserts, deletes)
+                                upserts, deletes = {}, set()
+                                window_start = None
+                    except PyMongoError as e:
+                        print(f"\n⚠️  Change stream interrupted ({e}); resuming")
+                    finally:
+                        self._flush(upserts, deletes)
+                    resume_token = stream.resume_token
+
+            if self._stop_event.is_set():
+                break
+            if invalidated:
+                # the stream can't be resumed past these: rescan and start a new one
+                print("\n⚠️  Collection dropped or renamed; rescanning")
+                self._needs_resync = True
+                self._retry_resync(force=True)
+                resume_token = None
+            stream = self._open(resume_token)
+
+    def _open(self, resume_token):
+        try:
+            if resume_token is None:
+                return self.collection.watch(self._pipeline(), full_document="updateLookup")
+            return self.collection.watch(self._pipeline(), full_document="updateLookup",
+                                         resume_after=resume_token)
+        except PyMongoError as e:
+            print(f"\n⚠️  Could not reopen change stream ({e}); retrying")
+            self._stop_event.wait(self.poll_interval)
+            self._needs_resync = True  # changes may be missed while the stream is down
+            return None
+
+    # Trim change events to the fields the index uses (MongoDB only keeps the
+    # top-level _id by itself, so fullDocument._id is listed explicitly)
+    def _pipeline(self):
+        projection = {"operationType": 1, "documentKey": 1, "fullDocument._id": 1}
+        projection.update({f"fullDocument.{f}": 1 for f in self.live.fields})
+        return [{"$project": projection}]
+
+    @staticmethod
+    def _collect(change, upserts, deletes):
+        op = change["operationType"]
+        key = change.get("documentKey")
+        if not key or "_id" not in key:
+            return  # not a document-level event
+        mongo_id = str(key["_id"])
+        if op in ("insert", "update", "replace") and change.get("fullDocument"):
+            doc = dict(change["fullDocument"])
+            doc.setdefault("_id", key["_id"])
+            upserts[mongo_id] = doc
+            deletes.discard(mongo_id)
+        elif op == "delete" or op in ("update", "replace"):
+            # An update whose document is already gone is a delete
+            upserts.pop(mongo_id, None)
+            deletes.add(mongo_id)
+
+    def _flush(self, upserts, deletes):
+        if not (upserts or deletes):
+            return
+        try:
+            stats = self.live.apply(list(upserts.values()), deletes)
+        except Exception as e:
+            # the batch is dropped; a full rescan picks its changes up again
+            print(f"\n⚠️  Live update failed ({e.__class__.__name__}: {e}); will rescan")
+            self._needs_resync = True
+            return
+        self._report(stats)
+
+    # Full hash-based rescan after a failure, at most once per poll_interval
+    def _retry_resync(self, force=False):
+        if not self._needs_resync:
+            return
+        if not force and time.monotonic() - self._last_resync < self.poll_interval:
+            return
+        self._last_resync = time.monotonic()
+        try:
+            stats = self.live.resync(self.collection)
+        except Exception as e:
+            print(f"\n⚠️  Rescan failed ({e.__class__.__name__}: {e})")
+            return
+        self._needs_resync = False
+        self._report(stats)
+
+    @staticmethod
+    def _report(stats):
+        if stats["added"] or stats["updated"] or stats["removed"]:
+            print(f"\n🔄 Live update: {stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['removed']} removed")
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                stats = self.live.resync(self.collection)
+            except Exception as e:
+                print(f"\n⚠️  Polling sync failed: {e}")
+                continue
+            self._report(stats)
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+from bson import json_util
+
+from training_filters import FILTER_FIELDS, DATE_FIELDS, filter_columns
+
+FILTER_COLUMNS = list(FILTER_FIELDS) + list(DATE_FIELDS)
+
+
+# ================= SQLITE METADATA STORE =================
+# One row per FAISS vector id. Opened lazily; lookups touch only the rows
+# asked for, so queries never load the whole collection into memory.
+#   text_hash  - hash of the text currently embedded for this document
+#   saved_hash - text_hash as of the last time the FAISS index was saved
+#   technology, company, trainer, start_date, end_date - normalized filter
+#                values, each with its own SQLite index (see training_filters.py)
+class MetadataStore:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)  # callers may chdir before first use
+        self._local = threading.local()  # one sqlite connection per thread
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            # WAL lets query threads read while the sync thread writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trainings (
+                    vid INTEGER PRIMARY KEY,
+                    mongo_id TEXT NOT NULL UNIQUE,
+                    text_hash TEXT,
+                    saved_hash TEXT,
+                    doc TEXT NOT NULL
+                )
+            """)
+            self._add_filter_columns(conn)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    # Stores created before filtering existed get the columns and a one-off backfill
+    @staticmethod
+    def _add_filter_columns(conn):
+        present = {row[1] for row in conn.execute("PRAGMA table_info(trainings)")}
+        missing = [col for col in FILTER_COLUMNS if col not in present]
+        for col in missing:
+            conn.execute(f"ALTER TABLE trainings ADD COLUMN {col} TEXT")
+        for col in FILTER_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS trainings_{col} ON trainings ({col})")
+        if missing:
+            rows = conn.execute("SELECT vid, doc FROM trainings").fetchall()
+            conn.executemany(
+                f"UPDATE trainings SET {', '.join(c + ' = ?' for c in FILTER_COLUMNS)} WHERE vid = ?",
+                [_filter_row(json_util.loads(doc)) + (vid,) for vid, doc in rows],
+            )
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM trainings").fetchone()[0]
+
+    def next_vid(self):
+        row = self._db().execute("SELECT MAX(vid) FROM trainings").fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    # Records for the given vector ids, in the same order (missing ids skipped)
+    def get_many(self, vids):
+        vids = [int(v) for v in vids]
+        if not vids:
+            return []
+        placeholders = ",".join("?" * len(vids))
+        rows = self._db().execute(
+            f"SELECT vid, doc FROM trainings WHERE vid IN ({placeholders})", vids
+        ).fetchall()
+        docs = {vid: json_util.loads(doc) for vid, doc in rows}
+        return [docs[v] for v in vids if v in docs]
+
+    # {mongo_id: (vid, text_hash)} for the given Mongo ids
+    def state_for(self, mongo_ids):
+        mongo_ids = list(mongo_ids)
+        state = {}
+        # stay under SQLite's bound-parameter limit
+        for start in range(0, len(mongo_ids), 900):
+            part = mongo_ids[start:start + 900]
+            placeholders = ",".join("?" * len(part))
+            for mongo_id, vid, text_hash in self._db().execute(
+                f"SELECT mongo_id, vid, text_hash FROM trainings WHERE mongo_id IN ({placeholders})",
+                part,
+            ):
+                state[mongo_id] = (vid, text_hash)
+        return state
+
+    def iter_mongo_ids(self):
+        for (mongo_id,) in self._db().execute("SELECT mongo_id FROM trainings"):
+            yield mongo_id
+
+    # upserts: [(vid, mongo_id, text_hash, doc)], deletes: [mongo_id]
+    def write(self, upserts, deletes):
+        conn = self._db()
+        columns = ", ".join(FILTER_COLUMNS)
+        marks = ", ".join("?" * len(FILTER_COLUMNS))
+        updates = ", ".join(f"{c}=excluded.{c}" for c in FILTER_COLUMNS)
+        with conn:
+            conn.executemany(
+                f"INSERT INTO trainings (vid, mongo_id, text_hash, doc, {columns}) "
+                f"VALUES (?, ?, ?, ?, {marks}) "
+                f"ON CONFLICT(vid) DO UPDATE SET text_hash=excluded.text_hash, doc=excluded.doc, {updates} "
+                "WHERE doc != excluded.doc OR text_hash IS NOT excluded.text_hash",
+                [(vid, mongo_id, text_hash, json_util.dumps(doc)) + _filter_row(doc)
+                 for vid, mongo_id, text_hash, doc in upserts],
+            )
+            conn.executemany("DELETE FROM trainings WHERE mongo_id = ?",
+                             [(mongo_id,) for mongo_id in deletes])
+
+    # Vector ids of the records matching every given filter (see parse_filters):
+    # any of the listed values per field; a date range keeps trainings that overlap it
+    def filter_vids(self, filters):
+        clauses, params = [], []
+        for col in FILTER_FIELDS:
+            values = filters.get(col)
+            if values:
+                clauses.append(f"{col} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if filters.get("date_from"):
+            clauses.append("COALESCE(end_date, start_date) >= ?")
+            params.append(filters["date_from"])
+        if filters.get("date_to"):
+            clauses.append("start_date <= ?")
+            params.append(filters["date_to"])
+        where = " AND ".join(clauses) or "1"
+        return [vid for (vid,) in self._db().execute(
+            f"SELECT vid FROM trainings WHERE {where}", params)]
+
+    def mark_saved(self):
+        conn = self._db()
+        with conn:
+            conn.execute("UPDATE trainings SET saved_hash = text_hash")
+
+    # Rows whose vector never made it into a saved index (crash between the
+    # metadata commit and faiss.write_index). Clearing text_hash makes the
+    # next sync re-embed them.
+    def reset_unsaved(self):
+        conn = self._db()
+        with conn:
+            vids = [vid for (vid,) in conn.execute(
+                "SELECT vid FROM trainings WHERE saved_hash IS NOT text_hash")]
+            conn.execute("UPDATE trainings SET text_hash = NULL WHERE saved_hash IS NOT text_hash")
+        return vids
+
+    def all_vids(self):
+        return [vid for (vid,) in self._db().execute("SELECT vid FROM trainings")]
+
+
+def _filter_row(doc):
+    columns = filter_columns(doc)
+    return tuple(columns[col] for col in FILTER_COLUMNS)
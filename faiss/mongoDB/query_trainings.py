@@ -1,41 +1,58 @@
 import os
-import json
+import sys
 import faiss
-import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.openai_embeddings import EmbeddingClient
+from rag_utils import index_factory, batch_query
+from rag_utils.answer_cache import AnswerCache
+from rag_utils.llm_stream import stream_chat, print_stream
+from rag_utils.context_packer import pack_context, CONTEXT_TOKEN_BUDGET
+from metadata_store import MetadataStore
+from trainings_sync import TrainingsIndex
+from training_filters import parse_filters, normalize_filters, describe_filters
+
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in environment (.env)")
 
 client = OpenAI(api_key=OPENAI_API_KEY)
+embedder = EmbeddingClient(client, model="text-embedding-3-small")
 
 # Paths
 FAISS_INDEX_PATH = "trainings.index"
-METADATA_PATH = "trainings_metadata.json"
+METADATA_PATH = "trainings_metadata.db"
+LEGACY_METADATA_PATH = "trainings_metadata.json"  # written by the old full-rebuild script
 
-# Load FAISS index and metadata
+# Load FAISS index; metadata rows are read from SQLite only for the hits
 index = faiss.read_index(FAISS_INDEX_PATH)
-with open(METADATA_PATH, "r", encoding="utf-8") as f:
-    trainings = json.load(f)
-
-# Quick sanity check: number of vectors vs metadata length
-if index.ntotal != len(trainings):
-    print(f"⚠️  FAISS index size (ntotal={index.ntotal}) != metadata length ({len(trainings)}).")
+if not isinstance(index, faiss.IndexIDMap):
+    # index from the original full-rebuild script: move it to the incremental format
+    index = TrainingsIndex.load(FAISS_INDEX_PATH, METADATA_PATH,
+                                legacy_metadata_path=LEGACY_METADATA_PATH).index
+    if index is None:
+        raise SystemExit("❌ No usable trainings index; run trainings_to_faiss.py first.")
+trainings = MetadataStore(METADATA_PATH)
+
+# Quick sanity check: number of vectors vs metadata rows
+metadata_count = trainings.count()
+if index.ntotal != metadata_count:
+    print(f"⚠️  FAISS index size (ntotal={index.ntotal}) != metadata length ({metadata_count}).")
     print("   If you recently changed data, re-run trainings_to_faiss.py to rebuild index/metadata.")
     # we continue, but this warning is important.
 
 def get_embedding(text):
-    resp = client.embeddings.create(model="text-embedding-3-small", input=text)
-    return np.array(resp.data[0].embedding, dtype=np.float32)
-
-def generate_llm_summary(query, matched_records):
-    # Build a compact context for the LLM (limit to e.g. 10 items to avoid token explosion)
-    max_records_for_llm = 10
-    context_items = matched_records[:max_records_for_llm]
-    context = "\n\n".join([
+    return embedder.embed_one(text)
+
+# Summaries for a repeated query over the same records are reused
+SUMMARY_MODEL = "gpt-4o-mini"
+summary_cache = AnswerCache(embed_fn=get_embedding)
+
+def record_to_context(r):
+    return (
         f"Training Name: {r.get('trainingName') or r.get('training_name')}\n"
         f"Trainer: {r.get('trainerName') or r.get('trainer')}\n"
         f"Company: {r.get('companyName') or r.get('company')}\n"
@@ -43,8 +60,19 @@ def generate_llm_summary(query, matched_records):
         f"Start Date: {r.get('startDate') or r.get('start_date')}\n"
         f"End Date: {r.get('endDate') or r.get('end_date')}\n"
         f"Remarks: {r.get('remarks')}\n"
-        for r in context_items
-    ])
+    )
+
+# Records in rank order, cut to the token budget (LLM_CONTEXT_TOKENS). They are already
+# unique by vector id, and near-identical records (e.g. "Batch 1" / "Batch 2") are
+# different trainings, so no shingle dedup.
+def pack_records(matched_records, budget=CONTEXT_TOKEN_BUDGET):
+    return pack_context([record_to_context(r) for r in matched_records],
+                        budget=budget, model=SUMMARY_MODEL, overlap=None)
+
+# stream=True returns a generator of text pieces instead of the full summary.
+# Pass `packed` when the caller already packed the records (e.g. to report tokens).
+def generate_llm_summary(query, matched_records, stream=False, packed=None):
+    context = (packed or pack_records(matched_records)).text
 
     prompt = f"""
 You are an assistant that summarizes training records.
@@ -56,42 +84,109 @@ Here are the most relevant training records (context):
 
 Give a concise human-readable summary that answers the user query. If none of the records match, say "No matching trainings found."
 """
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "system", "content": "You are a concise summarizer."},
-                  {"role": "user", "content": prompt}]
-    )
-    return resp.choices[0].message.content.strip()
-
-def search_and_dedup(query, raw_k=10):
-    # Get query embedding
-    q_vec = get_embedding(query).reshape(1, -1)
-
-    # Raw search: request more neighbors than you actually want to allow deduping
-    distances, indices = index.search(q_vec, raw_k)
-
+    messages = [{"role": "system", "content": "You are a concise summarizer."},
+                {"role": "user", "content": prompt}]
+    if stream:
+        return summary_cache.stream_or_compute(
+            query, lambda: stream_chat(client, SUMMARY_MODEL, messages),
+            context=(SUMMARY_MODEL, context))
+
+    def summarize():
+        resp = client.chat.completions.create(model=SUMMARY_MODEL, messages=messages)
+        return resp.choices[0].message.content.strip()
+    return summary_cache.get_or_compute(query, summarize, context=(SUMMARY_MODEL, context))
+
+def dedup_records(row_ids):
     # Deduplicate by returned index id, preserving order
     seen = set()
     unique_indices = []
-    for idx in indices[0]:
+    for idx in row_ids:
         if idx < 0:
             continue
         if idx not in seen:
             seen.add(idx)
             unique_indices.append(idx)
-        # stop early if we already covered all metadata
-        if len(seen) >= len(trainings):
+        # stop early if we already covered every vector
+        if len(seen) >= index.ntotal:
             break
 
-    # Map to records safely (guard against index length mismatch)
-    matched_records = []
-    for idx in unique_indices:
-        if 0 <= idx < len(trainings):
-            matched_records.append(trainings[idx])
+    # Fetch only these rows (ids missing from the metadata are skipped)
+    return trainings.get_many(unique_indices)
+
+# Structured filters come from key:value tokens in the query (company:acme year:2024,
+# see training_filters.py) and/or the `filters` dict. Matching vector ids are looked up
+# in the metadata store first, so FAISS only scores eligible trainings.
+def search_and_dedup(query, raw_k=10, filters=None):
+    text, parsed = parse_filters(query)
+    parsed.update(normalize_filters(filters or {}))
+
+    # Get query embedding (of the free text only)
+    q_vec = get_embedding(text).reshape(1, -1)
+
+    # Raw search: request more neighbors than you actually want to allow deduping
+    ids = trainings.filter_vids(parsed) if parsed else None
+    distances, indices = index_factory.search(index, q_vec, raw_k, ids=ids)
+
+    matched_records = dedup_records(indices[0])
     return matched_records, distances, indices
 
+# Many queries at once: one batched embedding call and one multi-row FAISS search for
+# the unfiltered queries; filtered ones are searched one by one with their own id set
+def search_and_dedup_batch(queries, raw_k=10):
+    parsed = [parse_filters(q) for q in queries]
+    q_vecs = embedder.embed([text for text, _ in parsed])
+    results = [None] * len(queries)
+
+    plain = [i for i, (_, filters) in enumerate(parsed) if not filters]
+    if plain:
+        distances, indices = index_factory.search(index, q_vecs[plain], raw_k)
+        for i, row_ids in zip(plain, indices):
+            results[i] = dedup_records(row_ids)
+
+    for i, (_, filters) in enumerate(parsed):
+        if filters:
+            distances, indices = index_factory.search(index, q_vecs[i:i + 1], raw_k,
+                                                      ids=trainings.filter_vids(filters))
+            results[i] = dedup_records(indices[0])
+    return results
+
+# LLM summaries for already retrieved records (one list per query)
+def summarize_batch(queries, records_per_query):
+    results = []
+    for query, records in zip(queries, records_per_query):
+        if not records:
+            results.append({"records": records, "summary": "No matching trainings found."})
+            continue
+        packed = pack_records(records)
+        results.append({"records": records,
+                        "summary": generate_llm_summary(query, records, packed=packed),
+                        "context_records": len(packed.indices),
+                        "context_tokens": packed.tokens})
+    return results
+
+# Batch handler: matched records per query, LLM summaries only if requested
+def answer_batch(queries, with_summary=False):
+    records_per_query = search_and_dedup_batch(queries)
+    if with_summary:
+        return summarize_batch(queries, records_per_query)
+    return [{"records": records} for records in records_per_query]
+
 # Main interactive loop (prints only LLM summary)
 if __name__ == "__main__":
+    parser = batch_query.batch_arg_parser("Query the trainings FAISS index")
+    parser.add_argument("--summary", action="store_true",
+                        help="in batch mode, also generate an LLM summary per query")
+    args = parser.parse_args()
+    if args.batch:
+        if args.summary:
+            # next chunk is retrieved while this chunk's summaries are generated
+            batch_query.run_batch(args.batch, args.output, search_and_dedup_batch,
+                                  args.chunk_size, finish_chunk=summarize_batch)
+        else:
+            batch_query.run_batch(args.batch, args.output,
+                                  lambda qs: answer_batch(qs), args.chunk_size)
+        raise SystemExit
+
     print("\nEnter your query ('exit' to quit):\n")
     while True:
         query = input().strip()
@@ -102,6 +197,9 @@ if __name__ == "__main__":
             break
 
         print(f"\n Query: {query}\n")
+        filters = parse_filters(query)[1]
+        if filters:
+            print(f"🔎 Filters: {describe_filters(filters)}\n")
 
         matched_records, raw_distances, raw_indices = search_and_dedup(query, raw_k=10)
 
@@ -111,8 +209,10 @@ if __name__ == "__main__":
             print("="*80 + "\n")
             continue
 
-        # Generate LLM summary (only)
-        summary = generate_llm_summary(query, matched_records)
+        # Stream the LLM summary (only) as it is generated
+        packed = pack_records(matched_records)
+        print(f"📦 Context: {len(packed.indices)} of {len(matched_records)} records, "
+              f"{packed.tokens} tokens")
         print("\nResponse:\n")
-        print(summary)
+        print_stream(generate_llm_summary(query, matched_records, stream=True, packed=packed))
         print("\n" + "="*80 + "\n")
@@ -1,16 +1,24 @@
 import os
-import faiss
-import numpy as np
+import sys
 from openai import OpenAI
 from pymongo import MongoClient
 from dotenv import load_dotenv
-import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.openai_embeddings import EmbeddingClient
+from rag_utils.answer_cache import AnswerCache
+from rag_utils.llm_stream import stream_chat, print_stream
+from rag_utils.context_packer import pack_context, CONTEXT_TOKEN_BUDGET
+from trainings_sync import TrainingsIndex
+from live_index import LiveTrainingsIndex, ChangeWatcher
+from training_filters import parse_filters, describe_filters
 
 # Load environment variables
 load_dotenv()
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+embedder = EmbeddingClient(client, model="text-embedding-3-small", max_workers=4)
 
 # Connect to MongoDB
 mongo_uri = os.getenv("MONGO_ONLY_URI")  # example: mongodb+srv://ritik:<password>@cluster0.mongodb.net/
@@ -21,54 +29,59 @@ mongo_client = MongoClient(mongo_uri)
 collection = mongo_client[db_name][collection_name]
 
 
-# ---- 1️⃣ Fetch real-time data from MongoDB ----
-def fetch_mongo_data():
-    records = list(collection.find({}))
-    print(f"✅ Fetched {len(records)} records from MongoDB")
-    clean_records = []
-    for record in records:
-        record["_id"] = str(record["_id"])
-        clean_records.append(record)
-    return clean_records
+# Local copies of the index so restarts only sync what changed in MongoDB
+FAISS_INDEX_PATH = "realtime_trainings.index"
+METADATA_PATH = "realtime_trainings_metadata.db"
 
 
-# ---- 2️⃣ Generate embeddings ----
+# ---- 1️⃣ Generate embeddings ----
 def get_embedding(text):
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+    return embedder.embed_one(text)
+
+
+# ---- 2️⃣ Text used for each MongoDB training ----
+# Fields fetched from MongoDB: the text below plus what llm_summarize shows
+TRAINING_FIELDS = [
+    "training_name", "trainer", "company", "technology", "start_date", "end_date", "remarks",
+    "trainingName", "trainerName", "companyName", "startDate", "endDate",
+]
+
+
+def training_to_text(t):
+    return (
+        f"Training Name: {t.get('training_name', '')}\n"
+        f"Trainer: {t.get('trainer', '')}\n"
+        f"Company: {t.get('company', '')}\n"
+        f"Technology: {t.get('technology', '')}\n"
+        f"Start Date: {t.get('start_date', '')}\n"
+        f"End Date: {t.get('end_date', '')}\n"
+        f"Remarks: {t.get('remarks', '')}"
     )
-    return np.array(response.data[0].embedding, dtype="float32")
-
-
-# ---- 3️⃣ Convert MongoDB data to FAISS vectors ----
-def create_faiss_index(trainings):
-    texts = []
-    metadata = []
-
-    for t in trainings:
-        text = (
-            f"Training Name: {t.get('training_name', '')}\n"
-            f"Trainer: {t.get('trainer', '')}\n"
-            f"Company: {t.get('company', '')}\n"
-            f"Technology: {t.get('technology', '')}\n"
-            f"Start Date: {t.get('start_date', '')}\n"
-            f"End Date: {t.get('end_date', '')}\n"
-            f"Remarks: {t.get('remarks', '')}"
-        )
-        texts.append(text)
-        metadata.append(t)
 
-    embeddings = [get_embedding(txt) for txt in texts]
-    dim = len(embeddings[0])
-    index = faiss.IndexFlatL2(dim)
-    index.add(np.array(embeddings))
-    return index, metadata
+
+# ---- 3️⃣ Incrementally sync MongoDB data into the FAISS index ----
+# The change stream is opened before the scan, so writes made during it are not lost
+def sync_faiss_index():
+    store = TrainingsIndex.load(FAISS_INDEX_PATH, METADATA_PATH)
+    live = LiveTrainingsIndex(store, embedder, to_text=training_to_text, fields=TRAINING_FIELDS)
+    watcher = ChangeWatcher(live, collection)
+    watcher.open()
+
+    stats = live.resync(collection)
+    live.save(FAISS_INDEX_PATH)
+    print(f"✅ Synced MongoDB: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+    return live, watcher
 
 
 # ---- 4️⃣ Use LLM to summarize / interpret the result ----
-def llm_summarize(query, results):
-    context = "\n\n".join([
+# Keyed by query + the records shown, so a changed record in MongoDB gets a fresh summary
+SUMMARY_MODEL = "gpt-4o-mini"
+summary_cache = AnswerCache(embed_fn=get_embedding)
+
+
+def record_to_context(r):
+    return (
         f"Training Name: {r['trainingName']}\n"
         f"Trainer: {r['trainerName']}\n"
         f"Company: {r['companyName']}\n"
@@ -76,8 +89,19 @@ def llm_summarize(query, results):
         f"Start Date: {r['startDate']}\n"
         f"End Date: {r['endDate']}\n"
         f"Remarks: {r['remarks']}\n"
-        for r in results
-    ])
+    )
+
+
+# Results in rank order, cut to the token budget (LLM_CONTEXT_TOKENS). Records are unique
+# by vector id already; no shingle dedup, near-identical records are distinct trainings.
+def pack_results(results, budget=CONTEXT_TOKEN_BUDGET):
+    return pack_context([record_to_context(r) for r in results], budget=budget,
+                        model=SUMMARY_MODEL, overlap=None)
+
+
+# stream=True returns a generator of text pieces instead of the full summary
+def llm_summarize(query, results, query_emb=None, stream=False, packed=None):
+    context = (packed or pack_results(results)).text
 
     prompt = f"""
 You are an assistant that summarizes training data.
@@ -87,39 +111,59 @@ Here are the related training records:
 Please give a meaningful and concise summary of the relevant information.
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.5
-    )
+    messages = [{"role": "user", "content": prompt}]
+    if stream:
+        return summary_cache.stream_or_compute(
+            query, lambda: stream_chat(client, SUMMARY_MODEL, messages, temperature=0.5),
+            context=(SUMMARY_MODEL, context), vector=query_emb)
+
+    def summarize():
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=messages,
+            temperature=0.5
+        )
+        return response.choices[0].message.content.strip()
 
-    return response.choices[0].message.content.strip()
+    return summary_cache.get_or_compute(query, summarize, context=(SUMMARY_MODEL, context),
+                                        vector=query_emb)
 
 
 # ---- 5️⃣ Main interactive query loop ----
 def main():
-    trainings = fetch_mongo_data()
-    if not trainings:
+    live, watcher = sync_faiss_index()
+    if live.store.metadata.count() == 0:
         print("❌ No data found in MongoDB.")
+        watcher.stop()
         return
 
-    index, metadata = create_faiss_index(trainings)
-    print("✅ FAISS index created from real-time MongoDB data.\n")
-
-    while True:
-        query = input("Enter your query ('exit' to quit): ").strip()
-        if query.lower() == "exit":
-            break
-
-        query_emb = get_embedding(query).reshape(1, -1)
-        distances, indices = index.search(query_emb, k=min(5, len(metadata)))
-
-        results = [metadata[i] for i in indices[0] if i < len(metadata)]
-
-        summary = llm_summarize(query, results)
-        print("\n🤖 LLM Summary:\n")
-        print(summary)
-        print("\n" + "="*80 + "\n")
+    # Keep the index live: a background thread applies MongoDB writes
+    watcher.start()
+    print("✅ FAISS index ready from real-time MongoDB data (watching for changes).\n")
+
+    try:
+        while True:
+            query = input("Enter your query ('exit' to quit): ").strip()
+            if query.lower() == "exit":
+                break
+
+            # key:value tokens (tech:python company:acme year:2024) filter the search
+            text, filters = parse_filters(query)
+            if filters:
+                print(f"🔎 Filters: {describe_filters(filters)}")
+
+            query_emb = get_embedding(text).reshape(1, -1)
+            results = live.search(query_emb, k=5, filters=filters)
+
+            packed = pack_results(results)
+            print(f"📦 Context: {len(packed.indices)} of {len(results)} records, {packed.tokens} tokens")
+            print("\n🤖 LLM Summary:\n")
+            print_stream(llm_summarize(query, results, query_emb, stream=True, packed=packed))
+            print("\n" + "="*80 + "\n")
+    finally:
+        watcher.stop()
+        watcher.join(timeout=5)
+        live.save(FAISS_INDEX_PATH)
 
 
 if __name__ == "__main__":
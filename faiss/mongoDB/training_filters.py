@@ -0,0 +1,123 @@
+import re
+import calendar
+from datetime import date, datetime
+
+
+# ================= STRUCTURED FILTERS =================
+# Filter columns kept next to each record in the metadata store, and the
+# document keys they are read from (both trainings schemas are in use)
+FILTER_FIELDS = {
+    "technology": ("technology",),
+    "company": ("companyName", "company"),
+    "trainer": ("trainerName", "trainer"),
+}
+DATE_FIELDS = {
+    "start_date": ("startDate", "start_date"),
+    "end_date": ("endDate", "end_date"),
+}
+DATE_FORMATS = ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y", "%d %b %Y", "%d %B %Y",
+                "%b %d, %Y", "%B %d, %Y"]
+
+# key:value tokens understood in a query, e.g.
+#   python trainings company:"Acme Corp" year:2024
+#   tech:java trainer:ravi from:2024-03 to:2024-06
+QUERY_KEYS = {"technology": "technology", "tech": "technology", "company": "company",
+              "trainer": "trainer", "from": "date_from", "after": "date_from",
+              "to": "date_to", "before": "date_to", "year": "year"}
+TOKEN_RE = re.compile(r'\b(' + "|".join(QUERY_KEYS) + r'):("[^"]*"|\S+)', re.IGNORECASE)
+
+
+def normalize_value(value):
+    if value is None:
+        return None
+    value = " ".join(str(value).split()).lower()
+    return value or None
+
+
+# ISO "YYYY-MM-DD" (compares correctly as text), or None if unparseable
+def normalize_date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if not value:
+        return None
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _first(doc, keys):
+    for key in keys:
+        if doc.get(key) not in (None, ""):
+            return doc[key]
+    return None
+
+
+# Column values stored for a record: {"technology": ..., "start_date": ..., ...}
+def filter_columns(doc):
+    columns = {col: normalize_value(_first(doc, keys)) for col, keys in FILTER_FIELDS.items()}
+    columns.update({col: normalize_date(_first(doc, keys)) for col, keys in DATE_FIELDS.items()})
+    return columns
+
+
+# "2024" / "2024-03" / "2024-03-15" -> first or last day of that period
+def _date_bound(text, end=False):
+    parts = text.split("-")
+    try:
+        if len(parts) == 1:
+            return f"{int(parts[0]):04d}-12-31" if end else f"{int(parts[0]):04d}-01-01"
+        if len(parts) == 2:
+            year, month = int(parts[0]), int(parts[1])
+            day = calendar.monthrange(year, month)[1] if end else 1
+            return f"{year:04d}-{month:02d}-{day:02d}"
+    except ValueError:
+        return None
+    return normalize_date(text)
+
+
+# Splits key:value filter tokens off a query. Returns (text to embed, filters) where
+# filters holds lists for technology / company / trainer and ISO date_from / date_to.
+# A query made only of filters keeps its full text for the embedding.
+def parse_filters(query):
+    filters = {}
+    for key, value in TOKEN_RE.findall(query):
+        key, value = QUERY_KEYS[key.lower()], value.strip('"')
+        if key == "year":
+            filters["date_from"], filters["date_to"] = _date_bound(value), _date_bound(value, end=True)
+        elif key in ("date_from", "date_to"):
+            filters[key] = _date_bound(value, end=key == "date_to")
+        elif normalize_value(value):
+            filters.setdefault(key, []).append(normalize_value(value))
+    filters = {k: v for k, v in filters.items() if v}
+    text = " ".join(TOKEN_RE.sub(" ", query).split())
+    return (text or query), filters
+
+
+# Explicit filters (e.g. from an API payload) in the same shape as parse_filters
+def normalize_filters(filters):
+    out = {}
+    for key in FILTER_FIELDS:
+        values = filters.get(key)
+        if values:
+            values = [values] if isinstance(values, str) else values
+            out[key] = [v for v in map(normalize_value, values) if v]
+    for key in ("date_from", "date_to"):
+        if filters.get(key):
+            out[key] = _date_bound(str(filters[key]), end=key == "date_to")
+    return {k: v for k, v in out.items() if v}
+
+
+def describe_filters(filters):
+    parts = [f"{k}={'|'.join(v)}" for k, v in filters.items() if k in FILTER_FIELDS]
+    if filters.get("date_from") or filters.get("date_to"):
+        parts.append(f"dates {filters.get('date_from') or '…'} → {filters.get('date_to') or '…'}")
+    return ", ".join(parts)
@@ -0,0 +1,215 @@
+import os
+import sys
+import faiss
+import numpy as np
+from bson import json_util
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.embedding_cache import text_hash
+from rag_utils import index_factory
+from metadata_store import MetadataStore
+
+
+# Only these fields are pulled from MongoDB (text + what the LLM summary shows)
+DOC_FIELDS = ["trainingName", "technology", "vendor", "companyName", "trainerName",
+              "startDate", "endDate", "remarks"]
+
+
+# ================= TEXT REPRESENTATION =================
+def doc_to_text(doc):
+    return f"""
+    Training Name: {doc.get('trainingName','')}
+    Technology: {doc.get('technology','')}
+    Vendor: {doc.get('vendor','')}
+    Company: {doc.get('companyName','')}
+    Trainer: {doc.get('trainerName','')}
+    Start Date: {doc.get('startDate','')}
+    End Date: {doc.get('endDate','')}
+    Remarks: {doc.get('remarks','')}
+    """
+
+
+# ================= INCREMENTAL INDEX =================
+# FAISS vectors are keyed by a stable integer id per Mongo _id (IndexIDMap2),
+# so changed / deleted documents can be replaced or removed in place.
+# The metadata store keeps, per vector id, the record and a hash of its text.
+# IVF indexes are trained on the first sync batch (train_size documents);
+# HNSW can't remove vectors, so it isn't usable here.
+class TrainingsIndex:
+    def __init__(self, index, metadata, index_kind=None, train_size=20_000):
+        self.index = index
+        self.metadata = metadata
+        self.index_kind = index_kind
+        self.train_size = train_size
+        self.n_expected = None
+
+    @classmethod
+    def load(cls, index_path, metadata_path, rebuild=False, index_kind=None,
+             legacy_metadata_path=None, to_text=doc_to_text):
+        if rebuild:
+            _remove_files(index_path, metadata_path)
+
+        index = faiss.read_index(index_path) if os.path.exists(index_path) else None
+        metadata = MetadataStore(metadata_path)
+        if index is not None and not isinstance(index, faiss.IndexIDMap):
+            # index written by the original full-rebuild script: plain positional ids
+            if not _migrate_legacy(index, metadata, index_path, legacy_metadata_path, to_text):
+                print(f"⚠️  {index_path} predates incremental sync and can't be migrated; rebuilding")
+                _remove_files(index_path, metadata_path)
+                metadata = MetadataStore(metadata_path)
+            index = faiss.read_index(index_path) if os.path.exists(index_path) else None
+        elif index is not None and index.ntotal and metadata.count() == 0:
+            print(f"⚠️  {index_path} has {index.ntotal} vectors but no metadata; rebuilding")
+            _remove_files(index_path, metadata_path)
+            index, metadata = None, MetadataStore(metadata_path)
+
+        store = cls(index, metadata, index_kind)
+        store._reconcile()
+        return store
+
+    def save(self, index_path):
+        if self.index is not None:
+            faiss.write_index(self.index, index_path)
+        self.metadata.mark_saved()
+
+    # Bring the index file and the metadata back in line after an interrupted run
+    def _reconcile(self):
+        stale = set(self.metadata.reset_unsaved())
+        if self.index is not None:
+            known = set(self.metadata.all_vids())
+            indexed = faiss.vector_to_array(self.index.id_map)
+            stale.update(int(v) for v in indexed if int(v) not in known)
+        self._remove(sorted(stale))
+
+    def _remove(self, vids):
+        if vids and self.index is not None:
+            self.index.remove_ids(np.array(vids, dtype="int64"))
+
+    def _add(self, vids, embeddings):
+        if self.index is None:
+            n = max(self.n_expected or 0, len(embeddings))
+            kind = index_factory.choose_index_type(n, self.index_kind)
+            if not index_factory.supports_removal(kind):
+                raise ValueError(f"{kind} indexes can't remove vectors; use flat, ivf or ivfpq")
+            train = embeddings if index_factory.needs_training(kind) else None
+            self.index = faiss.IndexIDMap2(
+                index_factory.new_index(embeddings.shape[1], kind, n_expected=n, train_vectors=train))
+        self.index.add_with_ids(embeddings, np.array(vids, dtype="int64"))
+
+    # Apply upserted docs and deleted Mongo ids; only new / changed text is embedded
+    def apply(self, docs, deleted_ids, embedder, to_text=doc_to_text):
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+        existing = self.metadata.state_for(doc["_id"] for doc in docs)
+        next_vid = self.metadata.next_vid()
+
+        upserts, stale_vids, new_vids, new_texts = [], [], [], []
+        for doc in docs:
+            mongo_id = doc["_id"]
+            text = to_text(doc)
+            digest = text_hash(text)
+            entry = existing.get(mongo_id)
+
+            if entry is None:
+                vid = next_vid
+                next_vid += 1
+                stats["added"] += 1
+            elif entry[1] != digest:
+                vid = entry[0]
+                stale_vids.append(vid)
+                stats["updated"] += 1
+            else:
+                # Text unchanged: keep the vector, refresh the record only
+                upserts.append((entry[0], mongo_id, digest, doc))
+                stats["unchanged"] += 1
+                continue
+
+            existing[mongo_id] = (vid, digest)
+            upserts.append((vid, mongo_id, digest, doc))
+            new_vids.append(vid)
+            new_texts.append(text)
+
+        deleted_ids = [str(m) for m in deleted_ids]
+        for vid, _ in self.metadata.state_for(deleted_ids).values():
+            stale_vids.append(vid)
+            stats["removed"] += 1
+
+        # Embed before touching the index: if embedding fails nothing has changed,
+        # so the same documents are picked up again by the next apply / sync
+        embeddings = embedder.embed(new_texts) if new_texts else None
+        self._remove(stale_vids)
+        if new_texts:
+            self._add(new_vids, embeddings)
+        self.metadata.write(upserts, deleted_ids)
+        return stats
+
+    # Stream the collection in batches: each batch is embedded and appended
+    # before the next is fetched, so memory is bounded by batch_size.
+    # Ids not seen during the scan are removed at the end.
+    def sync(self, collection, embedder, to_text=doc_to_text, fields=DOC_FIELDS,
+             batch_size=500):
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+
+        # A fresh index may need a larger first batch to train IVF centroids on
+        flush_at = batch_size
+        if self.index is None:
+            self.n_expected = collection.estimated_document_count()
+            kind = index_factory.choose_index_type(self.n_expected, self.index_kind)
+            if index_factory.needs_training(kind):
+                flush_at = max(batch_size, self.train_size)
+
+        cursor = collection.find({}, projection=list(fields)).batch_size(batch_size)
+        batch = []
+        for doc in cursor:
+            seen.add(str(doc["_id"]))
+            batch.append(doc)
+            if len(batch) >= flush_at:
+                _add_stats(stats, self.apply(batch, [], embedder, to_text))
+                batch = []
+                flush_at = batch_size
+
+        deleted = [mongo_id for mongo_id in self.metadata.iter_mongo_ids() if mongo_id not in seen]
+        _add_stats(stats, self.apply(batch, deleted, embedder, to_text))
+        return stats
+
+
+def _remove_files(index_path, metadata_path):
+    for path in (index_path, metadata_path, metadata_path + "-wal", metadata_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# The original script saved a plain IndexFlatL2 plus trainings_metadata.json, with
+# vector i belonging to document i. Those vectors are reused (no re-embedding): the
+# index is rewrapped as IndexIDMap2 with vid = position and the records move into the
+# metadata store. Returns False if there's nothing consistent to migrate from.
+def _migrate_legacy(index, metadata, index_path, legacy_metadata_path, to_text):
+    if not legacy_metadata_path or not os.path.exists(legacy_metadata_path):
+        return False
+    if metadata.count():
+        return False
+    with open(legacy_metadata_path, "r", encoding="utf-8") as f:
+        docs = json_util.loads(f.read())
+    inner = faiss.downcast_index(index)
+    if len(docs) != index.ntotal or not isinstance(inner, faiss.IndexFlat):
+        return False
+
+    vectors = inner.reconstruct_n(0, index.ntotal)
+    migrated = faiss.IndexIDMap2(index_factory.new_index(index.d, "flat"))
+    migrated.add_with_ids(vectors, np.arange(len(docs), dtype="int64"))
+    upserts = []
+    for vid, doc in enumerate(docs):
+        doc["_id"] = str(doc["_id"])
+        upserts.append((vid, doc["_id"], text_hash(to_text(doc)), doc))
+    metadata.write(upserts, [])
+    faiss.write_index(migrated, index_path)
+    metadata.mark_saved()
+    print(f"🔁 Migrated {len(docs)} documents from {legacy_metadata_path} (no re-embedding)")
+    return True
+
+
+def _add_stats(total, stats):
+    for key, value in stats.items():
+        total[key] += value
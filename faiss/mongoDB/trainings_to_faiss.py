@@ -1,11 +1,13 @@
 import os
-import json
-import faiss
-import numpy as np
+import sys
+import argparse
 from pymongo import MongoClient
 from openai import OpenAI
 from dotenv import load_dotenv
-from bson import json_util
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.openai_embeddings import EmbeddingClient
+from trainings_sync import TrainingsIndex, doc_to_text
 
 load_dotenv()  # load OPENAI_API_KEY from .env
 
@@ -14,49 +16,39 @@ MONGO_URI=os.getenv("MONGO_URI")
 DB_NAME = "training_portal"
 COLLECTION_NAME = "trainings"
 FAISS_INDEX_PATH = "trainings.index"
-EMBEDDINGS_JSON_PATH = "trainings_metadata.json"
+METADATA_DB_PATH = "trainings_metadata.db"
+LEGACY_METADATA_PATH = "trainings_metadata.json"  # written by the old full-rebuild script
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+embedder = EmbeddingClient(client, model="text-embedding-3-small", max_workers=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync MongoDB trainings into a FAISS index")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="ignore saved state and re-embed every document")
+    parser.add_argument("--index-type", choices=["auto", "flat", "ivf", "ivfpq"], default=None,
+                        help="FAISS index for a new build (default: FAISS_INDEX_TYPE or auto)")
+    args = parser.parse_args()
+
+    # ================= LOAD PREVIOUS STATE =================
+    store = TrainingsIndex.load(FAISS_INDEX_PATH, METADATA_DB_PATH, rebuild=args.rebuild,
+                                index_kind=args.index_type, legacy_metadata_path=LEGACY_METADATA_PATH)
+    print(f"📦 Loaded sync state for {store.metadata.count()} documents")
+
+    # ================= SYNC FROM MONGO =================
+    mongo_client = MongoClient(MONGO_URI)
+    collection = mongo_client[DB_NAME][COLLECTION_NAME]
+
+    print("🧠 Embedding new / changed documents...")
+    stats = store.sync(collection, embedder, to_text=doc_to_text)
+    print(f"✅ Added {stats['added']}, updated {stats['updated']}, "
+          f"removed {stats['removed']}, unchanged {stats['unchanged']}")
+
+    # ================= SAVE INDEX AND METADATA =================
+    store.save(FAISS_INDEX_PATH)
+    print(f"✅ Saved FAISS index ({FAISS_INDEX_PATH}) and metadata ({METADATA_DB_PATH})")
+
 
-# ================= FETCH DATA FROM MONGO =================
-mongo_client = MongoClient(MONGO_URI)
-collection = mongo_client[DB_NAME][COLLECTION_NAME]
-trainings = list(collection.find())
-print(f"✅ Fetched {len(trainings)} records from MongoDB")
-
-# ================= CREATE TEXT REPRESENTATION =================
-def doc_to_text(doc):
-    return f"""
-    Training Name: {doc.get('trainingName','')}
-    Technology: {doc.get('technology','')}
-    Vendor: {doc.get('vendor','')}
-    Company: {doc.get('companyName','')}
-    Trainer: {doc.get('trainerName','')}
-    Start Date: {doc.get('startDate','')}
-    End Date: {doc.get('endDate','')}
-    Remarks: {doc.get('remarks','')}
-    """
-
-texts = [doc_to_text(doc) for doc in trainings]
-
-# ================= GENERATE EMBEDDINGS =================
-print("🧠 Generating embeddings...")
-embeddings = []
-for text in texts:
-    resp = client.embeddings.create(input=text, model="text-embedding-3-small")
-    embeddings.append(resp.data[0].embedding)
-
-embeddings = np.array(embeddings, dtype="float32")
-
-# ================= CREATE FAISS INDEX =================
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
-
-# ================= SAVE INDEX AND METADATA =================
-# Convert MongoDB objects to JSON-serializable format
-with open(EMBEDDINGS_JSON_PATH, "w") as f:
-    json.dump(trainings, f, default=json_util.default, indent=2)
-
-faiss.write_index(index, FAISS_INDEX_PATH)
-print(f"✅ Saved FAISS index ({FAISS_INDEX_PATH}) and metadata ({EMBEDDINGS_JSON_PATH})")
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import os
-import faiss
-import numpy as np
+import sys
 from openai import OpenAI
-from pypdf import PdfReader
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.embedding_cache import cached_encode
+from rag_utils.pdf_ingest import iter_pdf_pages
+from rag_utils.chunking import iter_chunks
+from rag_utils import index_factory, similarity, batch_query
+from rag_utils.llm_stream import stream_chat, print_stream
+from rag_utils.context_packer import pack_context, CONTEXT_TOKEN_BUDGET
+
 from dotenv import load_dotenv
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -14,87 +20,138 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 
 # ====== CONFIG ======
 PDF_PATH = "data.pdf"  # 👈 Replace with your actual PDF file name
-THRESHOLD = 0.65
 EMBED_MODEL = "all-MiniLM-L6-v2"  # lightweight embedding model
+# Cosine threshold, calibrated per model (rag_utils/similarity_thresholds.json)
+THRESHOLD = similarity.get_threshold(EMBED_MODEL, "faiss_pdf", default=0.59)
 
 # ====== STEP 1: Load and chunk PDF text ======
-def extract_pdf_text(pdf_path):
-    reader = PdfReader(pdf_path)
-    pages = [page.extract_text() for page in reader.pages if page.extract_text()]
-    return pages
-
-def split_text(text, chunk_size=500):
-    words = text.split()
-    chunks = [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-    return chunks
+model = SentenceTransformer(EMBED_MODEL)
 
-pdf_pages = extract_pdf_text(PDF_PATH)
+# Pages are extracted in parallel (PDF_WORKERS processes) and chunked as they arrive.
+# Chunks are sized by the model's tokenizer so none is truncated by the encoder;
+# start/end are character offsets on the page.
 chunks = []
-for i, page_text in enumerate(pdf_pages):
-    for chunk in split_text(page_text):
-        chunks.append({"page": i + 1, "text": chunk})
+for page_no, page_text in iter_pdf_pages(PDF_PATH):
+    for c in iter_chunks(page_text, model):
+        chunks.append({"page": page_no, "start": c.start, "end": c.end,
+                       "text": page_text[c.start:c.end]})
 
 print(f"📄 Extracted {len(chunks)} chunks from PDF")
 
 # ====== STEP 2: Create embeddings dynamically ======
-model = SentenceTransformer(EMBED_MODEL)
-embeddings = model.encode([c["text"] for c in chunks])
-embeddings = np.array(embeddings, dtype="float32")
+# Cached per chunk text, so restarts on an unchanged PDF skip the encoder
+embeddings = cached_encode(model, EMBED_MODEL, [c["text"] for c in chunks])
 
 # ====== STEP 3: Build FAISS index on the fly ======
-dim = embeddings.shape[1]
-index = faiss.IndexFlatL2(dim)
-index.add(embeddings)
+# Normalized vectors in an inner-product index: search scores are cosines.
+# Flat / IVF / HNSW is picked by corpus size (override with FAISS_INDEX_TYPE)
+index = similarity.build_cosine_index(embeddings)
+index_factory.print_index_report(index, similarity.normalize(embeddings), metric="ip")
 
 # ====== STEP 4: Interactive hybrid querying ======
-def ask_question(query):
-    query_emb = model.encode([query]).astype("float32")
-    distances, indices = index.search(query_emb, k=8)
+# Retrieval for many queries at once: one encode call, one multi-row search.
+# Returns [(cosine similarity, chunk index), ...] per query, best first.
+def search_chunks_batch(queries, k=8):
+    query_embs = model.encode(queries).astype("float32")
+    scores, indices = similarity.cosine_search(index, query_embs, k=k)
+    # drop empty slots on tiny PDFs
+    return [
+        [(float(s), int(idx)) for s, idx in zip(row_scores, row_ids) if idx >= 0]
+        for row_scores, row_ids in zip(scores, indices)
+    ]
+
+# Chunks that clear the threshold, best first, deduplicated and packed up to
+# the token budget (LLM_CONTEXT_TOKENS). Returns a PackedContext; .texts is the context.
+def select_context(hits, budget=CONTEXT_TOKEN_BUDGET):
+    good = [(score, idx) for score, idx in hits if score >= THRESHOLD]
+    return pack_context([chunks[idx]["text"] for _, idx in good],
+                        scores=[score for score, _ in good], budget=budget, model="gpt-4o-mini")
+
+# stream=True returns a generator of text pieces instead of the full answer
+def generate_answer(query, selected_chunks, stream=False):
+    if selected_chunks:
+        context = "\n\n".join(selected_chunks)
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant. Use the context if relevant."},
+            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
+        ]
+    else:
+        # Fallback if even top match is very poor
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": query}
+        ]
+    if stream:
+        return stream_chat(client, "gpt-4o-mini", messages)
+    completion = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+    return completion.choices[0].message.content
 
-    # Convert FAISS L2 distances to similarity (higher is better)
-    similarities = 1 / (1 + distances[0])
+def ask_question(query):
+    hits = search_chunks_batch([query])[0]
 
     print("\n🔍 FAISS search results:")
-    for i, idx in enumerate(indices[0]):
-        print(f"• Similarity = {similarities[i]:.4f} | Text preview = {chunks[idx]['text'][:90]}...")
+    for score, idx in hits:
+        print(f"• Similarity = {score:.4f} | Text preview = {chunks[idx]['text'][:90]}...")
 
     # Get top similarity
-    top_score = similarities[0]
+    top_score = hits[0][0] if hits else -1.0
 
     # 🚀 Dynamic logic
-    if top_score >= 0.55:  # much lower base threshold
-        # Take top chunks (even if similarity is low)
-        selected_chunks = [chunks[idx]["text"] for idx in indices[0][:5]]
-        context = "\n\n".join(selected_chunks)
-
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant. Use the context if relevant."},
-                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
-            ]
-        )
-        answer = completion.choices[0].message.content
-        print(f"\n🧠 Using top 5 PDF chunks as context (top similarity = {top_score:.4f})")
-        print("------------------------------------------------")
-        print(answer)
+    packed = select_context(hits)
+    selected_chunks = packed.texts
+    if selected_chunks:
+        print(f"\n🧠 Using top {len(selected_chunks)} PDF chunks as context "
+              f"({packed.tokens} tokens, top similarity = {top_score:.4f})")
     else:
-        # Fallback if even top match is very poor
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": query}
-            ]
-        )
-        answer = completion.choices[0].message.content
         print("\n🌐 Using online ChatGPT (no good PDF match found)")
-        print("------------------------------------------------")
-        print(answer)
+    print("------------------------------------------------")
+    # Print the answer as it streams in
+    return print_stream(generate_answer(query, selected_chunks, stream=True))
+
+def hits_result(hits):
+    return {
+        "top_score": hits[0][0] if hits else None,
+        "hits": [{"page": chunks[idx]["page"], "score": score,
+                  "preview": chunks[idx]["text"][:200]} for score, idx in hits],
+    }
+
+# LLM answers for already retrieved hits (one list per query)
+def answer_hits_batch(queries, hits_per_query):
+    results = []
+    for query, hits in zip(queries, hits_per_query):
+        result = hits_result(hits)
+        packed = select_context(hits)
+        result["answer"] = generate_answer(query, packed.texts)
+        result["source"] = "pdf" if packed.texts else "chatgpt"
+        result["context_tokens"] = packed.tokens
+        results.append(result)
+    return results
+
+# Batch handler: retrieval for the whole chunk, LLM answers only if requested
+def answer_batch(queries, with_answers=False):
+    hits_per_query = search_chunks_batch(queries)
+    if with_answers:
+        return answer_hits_batch(queries, hits_per_query)
+    return [hits_result(hits) for hits in hits_per_query]
 
 # ====== MAIN LOOP ======
-while True:
-    q = input("\nAsk something: ").strip()
-    if q.lower() in ["exit", "quit"]:
-        break
-    ask_question(q)
+if __name__ == "__main__":
+    parser = batch_query.batch_arg_parser("Query data.pdf with FAISS + ChatGPT")
+    parser.add_argument("--answer", action="store_true",
+                        help="in batch mode, also generate an LLM answer per query")
+    args = parser.parse_args()
+    if args.batch:
+        if args.answer:
+            # next chunk is retrieved while this chunk's answers are generated
+            batch_query.run_batch(args.batch, args.output, search_chunks_batch,
+                                  args.chunk_size, finish_chunk=answer_hits_batch)
+        else:
+            batch_query.run_batch(args.batch, args.output,
+                                  lambda qs: answer_batch(qs), args.chunk_size)
+        raise SystemExit
+
+    while True:
+        q = input("\nAsk something: ").strip()
+        if q.lower() in ["exit", "quit"]:
+            break
+        ask_question(q)
@@ -1,8 +1,12 @@
 import os
-import faiss
-import numpy as np
+import sys
 from sentence_transformers import SentenceTransformer
 from openai import OpenAI
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.embedding_cache import cached_encode
+from rag_utils import index_factory, similarity, batch_query
+
 from dotenv import load_dotenv
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -15,25 +19,35 @@ with open("data.txt", "r", encoding="utf-8") as f:
     lines = [line.strip() for line in f if line.strip()]
 
 # Convert lines to embeddings
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(lines, convert_to_numpy=True)
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
+embeddings = cached_encode(model, EMBED_MODEL, lines)
 
 # Create FAISS index
-dim = embeddings.shape[1]
-index = faiss.IndexFlatL2(dim)
-index.add(embeddings)
+# Normalized vectors in an inner-product index: search scores are cosines.
+# Flat / IVF / HNSW is picked by corpus size (override with FAISS_INDEX_TYPE)
+index = similarity.build_cosine_index(embeddings)
+index_factory.print_index_report(index, similarity.normalize(embeddings), metric="ip")
+
+# Cosine threshold, calibrated per model (rag_utils/similarity_thresholds.json)
+THRESHOLD = similarity.get_threshold(EMBED_MODEL, "faiss_txt", default=0.5)
 
 # Function to query FAISS
-def query_data_txt(query, k=1, threshold=0.5):
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    faiss.normalize_L2(query_embedding)
+def query_data_txt(query, k=1, threshold=THRESHOLD):
+    return query_data_txt_batch([query], k, threshold)[0]["answer"]
 
-    scores, indices = index.search(query_embedding, k)
+# Many queries at once: one encode call and one multi-row FAISS search
+def query_data_txt_batch(queries, k=1, threshold=THRESHOLD):
+    query_embeddings = model.encode(queries, convert_to_numpy=True)
+    scores, indices = similarity.cosine_search(index, query_embeddings, k)
 
-    if scores[0][0] > threshold:  # higher = more similar
-        return lines[indices[0][0]]
-    else:
-        return None
+    results = []
+    for row_scores, row_ids in zip(scores, indices):
+        best = float(row_scores[0])
+        # cosine similarity, higher = more similar
+        answer = lines[row_ids[0]] if row_ids[0] >= 0 and best > threshold else None
+        results.append({"answer": answer, "score": best})
+    return results
 
 # def query_data_txt(query, k=1):
 #     query_embedding = model.encode([query], convert_to_numpy=True)
@@ -60,6 +74,11 @@ def hybrid_query(query):
 
 # Example usage
 if __name__ == "__main__":
+    args = batch_query.batch_arg_parser("Query data.txt with FAISS").parse_args()
+    if args.batch:
+        batch_query.run_batch(args.batch, args.output, query_data_txt_batch, args.chunk_size)
+        raise SystemExit
+
     while True:
         user_query = input("Ask something: ")
         if user_query.lower() in ["exit", "quit"]:
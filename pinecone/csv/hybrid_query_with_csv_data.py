@@ -1,10 +1,15 @@
 import os
-import pandas as pd
+import sys
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
 from openai import OpenAI
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.pinecone_sync import sync_namespace
+from rag_utils.local_vector_store import open_index, manifest_name
+from rag_utils.answer_cache import AnswerCache
+from rag_utils.csv_ingest import iter_csv_rows
+
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -13,72 +18,84 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # SentenceTransformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
 
-# Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Repeated questions reuse the earlier ChatGPT answer (semantic reuse via ANSWER_CACHE_SEMANTIC_THRESHOLD)
+CHAT_MODEL = "gpt-4.1-mini"
+answer_cache = AnswerCache(embed_fn=lambda q: model.encode(q))
 
 # Use existing Pinecone index (VERY IMPORTANT)
 index_name = "text-rag-index"     # <- use your index name
-index = pc.Index(index_name)
+
+
+# Pinecone (VECTOR_BACKEND=local uses an on-disk FAISS index with the same interface)
+def connect_pinecone():
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    return pc.Index(index_name)
+
+
+index = open_index(index_name, connect_pinecone)
 
 # Namespace for CSV data
 NAMESPACE = "csv-data"
 
+# Columns embedded as text (None = all) and columns stored as Pinecone metadata
+TEXT_COLUMNS = None
+METADATA_COLUMNS = []
+
 
 # -----------------------------
 #  Load and process CSV
 # -----------------------------
+# Streams the CSV in chunks of rows; each row becomes "col: value | col: value"
+# (rendered column-wise, not row by row). Yields CsvBatch(rows, texts, metadata).
 def load_csv_chunks(csv_path="data.csv"):
-    df = pd.read_csv(csv_path)
-
-    rows = []
-    for i in df.index:
-        # Convert entire row to a single string
-        row_text = " | ".join([f"{col}: {df[col][i]}" for col in df.columns])
-
-        # Skip empty rows
-        if len(row_text.strip()) < 5:
-            continue
-
-        rows.append(row_text)
-
-    return rows
+    return iter_csv_rows(csv_path, text_columns=TEXT_COLUMNS, metadata_columns=METADATA_COLUMNS,
+                         skip_na=False, min_chars=5)  # skip empty rows
 
 
 # -----------------------------
 #   Store CSV vectors
 # -----------------------------
-def store_vectors():
-    rows = load_csv_chunks()
+def csv_records():
+    for batch in load_csv_chunks():
+        for j, row in enumerate(batch.texts):
+            metadata = None
+            if batch.metadata:
+                metadata = {k: v for k, v in batch.metadata[j].items() if v is not None}
+            yield row, metadata
 
-    vectors = []
-    for i, row in enumerate(rows):
-        embed = model.encode(row).tolist()
 
-        vectors.append({
-            "id": f"csv_{i}",
-            "values": embed,
-            "metadata": {"text": row},
-        })
-
-    index.upsert(vectors=vectors, namespace=NAMESPACE)
-    print(f"Saved {len(vectors)} rows inside namespace '{NAMESPACE}'!")
+def store_vectors():
+    # Rows stream in from the CSV; content-hash ids mean only new / changed rows are
+    # encoded and uploaded (in parallel, size-bounded batches) and removed rows are deleted
+    stats = sync_namespace(index, model, EMBED_MODEL, csv_records(),
+                           index_name=manifest_name(index_name), namespace=NAMESPACE,
+                           prefix="csv", legacy_prefix="csv_")
+    print(f"Saved {stats['added']} new rows inside namespace '{NAMESPACE}' "
+          f"({stats['unchanged']} unchanged, {stats['deleted']} removed, "
+          f"{stats['vectors_per_sec']} vectors/s)")
 
 
 # -----------------------------
 #    ChatGPT fallback
 # -----------------------------
-def ask_chatgpt(query):
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": query},
-        ]
-    )
+def ask_chatgpt(query, query_vec=None):
+    def ask():
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": query},
+            ]
+        )
+        return response.choices[0].message.content
+
+    answer = answer_cache.get_or_compute(query, ask, context=CHAT_MODEL, vector=query_vec)
     print("\nChatGPT Answer:\n")
-    print(response.choices[0].message.content)
+    print(answer)
 
 
 # -----------------------------
@@ -95,7 +112,7 @@ def ask_question(query):
     )
 
     if not res["matches"]:
-        ask_chatgpt(query)
+        ask_chatgpt(query, embed)
         return
 
     match = res["matches"][0]
@@ -105,7 +122,7 @@ def ask_question(query):
         # print("Score:", match["score"])
         print("Text:", match["metadata"]["text"])
     else:
-        ask_chatgpt(query)
+        ask_chatgpt(query, embed)
 
 
 # -----------------------------
@@ -1,10 +1,16 @@
 import os
+import sys
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
-from pypdf import PdfReader
 from openai import OpenAI
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.pinecone_sync import sync_namespace
+from rag_utils.local_vector_store import open_index, manifest_name
+from rag_utils.pdf_ingest import iter_pdf_pages
+from rag_utils.chunking import chunk_text
+from rag_utils.answer_cache import AnswerCache
+
 # Load keys
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -13,31 +19,38 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # Model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
 
-# Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Repeated questions reuse the earlier ChatGPT answer (semantic reuse via ANSWER_CACHE_SEMANTIC_THRESHOLD)
+CHAT_MODEL = "gpt-4.1-mini"
+answer_cache = AnswerCache(embed_fn=lambda q: model.encode(q))
 
 # Use an existing index (IMPORTANT — DO NOT CREATE NEW)
 index_name = "text-rag-index"   # <- use your existing index
-index = pc.Index(index_name)
+
+
+# Pinecone (VECTOR_BACKEND=local uses an on-disk FAISS index with the same interface)
+def connect_pinecone():
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    return pc.Index(index_name)
+
+
+index = open_index(index_name, connect_pinecone)
 
 # Namespace for organizing PDF data
 NAMESPACE = "pdf-data"
 
 
 # ---- Load PDF & split ----
+# Pages are extracted in parallel (PDF_WORKERS processes) and split into
+# sentence-aligned chunks sized for the encoder; returns [(page_no, chunk), ...]
 def load_pdf_chunks(pdf_path="data.pdf"):
-    reader = PdfReader(pdf_path)
-    text = ""
-
-    for page in reader.pages:
-        t = page.extract_text()
-        if t:
-            text += t + "\n"
-
-    chunks = text.split(".")
-    chunks = [c.strip() for c in chunks if len(c.strip()) > 20]
+    chunks = []
+    for page_no, text in iter_pdf_pages(pdf_path):
+        for chunk in chunk_text(text, model):
+            chunks.append((page_no, chunk))
 
     return chunks
 
@@ -46,31 +59,32 @@ def load_pdf_chunks(pdf_path="data.pdf"):
 def store_vectors():
     chunks = load_pdf_chunks()
 
-    vectors = []
-    for i, chunk in enumerate(chunks):
-        embed = model.encode(chunk).tolist()
-
-        vectors.append({
-            "id": f"pdf_{i}",
-            "values": embed,
-            "metadata": {"text": chunk},
-        })
-
-    index.upsert(vectors=vectors, namespace=NAMESPACE)
-    print(f"Saved {len(vectors)} chunks into namespace '{NAMESPACE}'!")
+    # Content-hash ids: only new / changed chunks are encoded and uploaded (in parallel,
+    # size-bounded batches); chunks that disappeared from the PDF are deleted
+    records = ((chunk, {"page": page_no}) for page_no, chunk in chunks)
+    stats = sync_namespace(index, model, EMBED_MODEL, records,
+                           index_name=manifest_name(index_name), namespace=NAMESPACE,
+                           prefix="pdf", legacy_prefix="pdf_")
+    print(f"Saved {stats['added']} new chunks into namespace '{NAMESPACE}' "
+          f"({stats['unchanged']} unchanged, {stats['deleted']} removed, "
+          f"{stats['vectors_per_sec']} vectors/s)")
 
 
 # ---- ChatGPT fallback ----
-def ask_chatgpt(query):
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": query},
-        ]
-    )
+def ask_chatgpt(query, query_vec=None):
+    def ask():
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": query},
+            ]
+        )
+        return response.choices[0].message.content
+
+    answer = answer_cache.get_or_compute(query, ask, context=CHAT_MODEL, vector=query_vec)
     print("\nChatGPT Answer:\n")
-    print(response.choices[0].message.content)
+    print(answer)
 
 
 # ---- Query Pinecone ----
@@ -85,7 +99,7 @@ def ask_question(query):
     )
 
     if not res["matches"]:
-        ask_chatgpt(query)
+        ask_chatgpt(query, embed)
         return
 
     match = res["matches"][0]
@@ -94,8 +108,10 @@ def ask_question(query):
         # print("\nBest Match:")
         # print("Score:", match["score"])
         print("Text:", match["metadata"]["text"])
+        if "page" in match["metadata"]:
+            print("Page:", int(match["metadata"]["page"]))
     else:
-        ask_chatgpt(query)
+        ask_chatgpt(query, embed)
 
 
 # ---- Main ----
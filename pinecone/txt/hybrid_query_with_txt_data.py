@@ -1,10 +1,16 @@
 import os
+import sys
 import numpy as np
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
 from openai import OpenAI
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from rag_utils.pinecone_sync import sync_namespace
+from rag_utils.local_vector_store import open_index, manifest_name
+from rag_utils.answer_cache import AnswerCache
+from rag_utils.chunking import chunk_text
+
 # Load ENV variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -13,26 +19,38 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # ---- STEP 1: Load Sentence Embedding Model ----
-model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+model = SentenceTransformer(EMBED_MODEL)
 
-# ---- STEP 2: Initialize Pinecone ----
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Repeated questions reuse the earlier ChatGPT answer (semantic reuse via ANSWER_CACHE_SEMANTIC_THRESHOLD)
+CHAT_MODEL = "gpt-4.1-mini"
+answer_cache = AnswerCache(embed_fn=lambda q: model.encode(q))
 
+# ---- STEP 2: Initialize Pinecone ----
+# (VECTOR_BACKEND=local uses an on-disk FAISS index with the same interface)
 index_name = "text-rag-index"
 
-# Create index if not exists
-if index_name not in [i["name"] for i in pc.list_indexes()]:
-    pc.create_index(
-        name=index_name,
-        dimension=384,                      # embedding size for MiniLM
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
+
+def connect_pinecone():
+    from pinecone import Pinecone, ServerlessSpec
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+
+    # Create index if not exists
+    if index_name not in [i["name"] for i in pc.list_indexes()]:
+        pc.create_index(
+            name=index_name,
+            dimension=384,                      # embedding size for MiniLM
+            metric="cosine",
+            spec=ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
         )
-    )
 
-index = pc.Index(index_name)
+    return pc.Index(index_name)
+
+
+index = open_index(index_name, connect_pinecone)
 
 
 # ---- STEP 3: Load and split TXT data ----
@@ -40,43 +58,40 @@ def load_and_split_text(file_path="data.txt"):
     with open(file_path, "r", encoding="utf-8") as f:
         text = f.read()
 
-    # Split by sentences
-    chunks = text.split(".")
-    chunks = [c.strip() for c in chunks if len(c.strip()) > 20]
-    return chunks
+    # Whole sentences, packed up to what the encoder can take without truncation
+    return chunk_text(text, model)
 
 
 # ---- STEP 4: Store vectors in Pinecone ----
 def store_vectors():
     chunks = load_and_split_text()
 
-    vectors = []
-
-    for i, chunk in enumerate(chunks):
-        vector = model.encode(chunk).tolist()
-        vectors.append({
-            "id": f"id_{i}",
-            "values": vector,
-            "metadata": {"text": chunk},
-        })
-
-    index.upsert(vectors=vectors)
-    print(f"Uploaded {len(vectors)} text chunks to Pinecone!")
+    # Content-hash ids: only new / changed chunks are encoded and uploaded (in parallel,
+    # size-bounded batches); chunks that disappeared from the file are deleted
+    stats = sync_namespace(index, model, EMBED_MODEL, ((chunk, None) for chunk in chunks),
+                           index_name=manifest_name(index_name), prefix="id", legacy_prefix="id_")
+    print(f"Uploaded {stats['added']} new text chunks to Pinecone "
+          f"({stats['unchanged']} unchanged, {stats['deleted']} removed, "
+          f"{stats['vectors_per_sec']} vectors/s)")
 
 
 # ---- STEP 5: Ask ChatGPT for fallback answer ----
-def ask_chatgpt(query):
+def ask_chatgpt(query, query_vec=None):
     # print("\n ChatGPT Answer (fallback because score < 0.5):\n")
 
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": query},
-        ],
-    )
+    def ask():
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": query},
+            ],
+        )
+        return response.choices[0].message.content
+
+    answer = answer_cache.get_or_compute(query, ask, context=CHAT_MODEL, vector=query_vec)
 
-    print(response.choices[0].message.content)
+    print(answer)
 
 
 # ---- STEP 6: Query Pinecone ----
@@ -94,7 +109,7 @@ def ask_question(query):
     if not results["matches"]:
         # print(" No match at all → using ChatGPT…")
         print("\n Result Using ChatGPT…")
-        ask_chatgpt(query)
+        ask_chatgpt(query, q_embed)
         return
 
     match = results["matches"][0]
@@ -105,7 +120,7 @@ def ask_question(query):
         print(f"\n Result: {match['metadata']['text']}")
     else:
         print("\n Result Using ChatGPT…")
-        ask_chatgpt(query)
+        ask_chatgpt(query, q_embed)
 
 
 # -------- MAIN RUN --------
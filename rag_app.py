@@ -1,10 +1,37 @@
+import os
+import json
+import shutil
+import hashlib
+from collections import namedtuple
 import streamlit as st
-import pandas as pd
-import fitz  # PyMuPDF
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from rag_utils.keyword_index import KeywordIndex
+from rag_utils.fusion import fuse
+from rag_utils.lru_cache import LRUCache
+from rag_utils.model_registry import get_sentence_model
+from rag_utils.embedding_cache import cached_encode
+from rag_utils.encode_scheduler import get_encode_scheduler
+from rag_utils import similarity, chunking
+from rag_utils.llm_stream import stream_chat
+from rag_utils.context_packer import pack_context
+from rag_utils.pdf_ingest import iter_pdf_pages
+from rag_utils.csv_ingest import iter_csv_rows
+
+load_dotenv()
+
+EMBED_MODEL = "all-MiniLM-L6-v2"
+INDEX_CACHE_SIZE = int(os.getenv("RAG_INDEX_CACHE_SIZE", "8"))  # files kept in memory
+# Built indexes are also saved here, one folder per file hash, and reused after a restart
+INDEX_DIR = os.getenv("RAG_INDEX_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rag_indexes"))
+ANSWER_MODEL = "gpt-4o-mini"
+
+# Everything built from one uploaded file (pages: PDF page of each chunk, None for TXT/CSV)
+CorpusIndex = namedtuple("CorpusIndex", ["preview", "chunks", "index", "keyword_index", "pages"])
 
 #  1. Helper Functions
 
@@ -14,58 +41,156 @@ def extract_text(file):
         return file.read().decode("utf-8")
 
     elif file.name.endswith(".csv"):
-        df = pd.read_csv(file)
-        return "\n".join(df.astype(str).apply(" ".join, axis=1).tolist())
+        # rows rendered column-wise, chunk by chunk
+        return "\n".join(text for batch in iter_csv_rows(file, with_names=False, sep=" ",
+                                                         skip_na=False)
+                         for text in batch.texts)
 
     elif file.name.endswith(".pdf"):
-        text = ""
-        with fitz.open(stream=file.read(), filetype="pdf") as doc:
-            for page in doc:
-                text += page.get_text()
-        return text
+        return "\n".join(text for _, text in iter_pdf_pages(file.read()))
 
     else:
         st.error("Unsupported file type! Please upload .txt, .csv, or .pdf")
         return None
 
 
-# Split text into smaller chunks (for better retrieval)
-def chunk_text(text, chunk_size=200):
-    words = text.split()
-    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+# Split text into chunks the encoder can embed without truncation (for better retrieval)
+def chunk_text(text):
+    return chunking.chunk_text(text, get_sentence_model(EMBED_MODEL))
+
+
+# Chunks plus the page each one came from; PDFs are extracted in parallel and
+# chunked page by page. Returns (preview, chunks, pages) or None.
+def extract_chunks(file):
+    if not file.name.endswith(".pdf"):
+        text = extract_text(file)
+        return (text[:1000], chunk_text(text), None) if text else None
+
+    chunks, pages, preview = [], [], ""
+    for page_no, text in iter_pdf_pages(file.read()):
+        if len(preview) < 1000:
+            preview += text[:1000 - len(preview)]
+        for chunk in chunk_text(text):
+            chunks.append(chunk)
+            pages.append(page_no)
+    return (preview, chunks, pages) if chunks else None
 
 
 #  2. Vector DB Creation (FAISS)
 
 def create_faiss_index(chunks, model):
-    embeddings = model.encode(chunks, convert_to_numpy=True)
-    dim = embeddings.shape[1]
-
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+    embeddings = cached_encode(model, EMBED_MODEL, chunks)
+    index = similarity.build_cosine_index(embeddings)  # scores are cosine similarities
 
     return index, embeddings
 
 
-#  3. Hybrid Search (Semantic + Keyword)
+def create_keyword_index(chunks):
+    return KeywordIndex.build(chunks)
+
+
+# Save / load the FAISS index together with its keyword index and chunks.
+# Files go to a temporary folder first, so a half-written corpus is never loaded.
+def save_indexes(directory, corpus):
+    tmp = f"{directory}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    faiss.write_index(corpus.index, os.path.join(tmp, "faiss.index"))
+    corpus.keyword_index.save(os.path.join(tmp, "keywords.pkl"))
+    with open(os.path.join(tmp, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump({"preview": corpus.preview, "chunks": corpus.chunks, "pages": corpus.pages}, f)
+    try:
+        os.replace(tmp, directory)
+    except OSError:  # saved meanwhile by another session
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_indexes(directory):
+    index = faiss.read_index(os.path.join(directory, "faiss.index"))
+    keyword_index = KeywordIndex.load(os.path.join(directory, "keywords.pkl"))
+    with open(os.path.join(directory, "chunks.json"), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return CorpusIndex(data["preview"], data["chunks"], index, keyword_index, data["pages"])
+
+
+# Streamlit re-runs this script on every interaction, so the cache object
+# itself is held by st.cache_resource and shared by all sessions.
+@st.cache_resource
+def get_index_cache():
+    return LRUCache(max_entries=INDEX_CACHE_SIZE)
+
+
+@st.cache_resource
+def get_llm_client():
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def hybrid_search(query, chunks, model, index, embeddings, top_k=3):
-    # --- Semantic Search using FAISS ---
-    query_emb = model.encode([query], convert_to_numpy=True)
-    _, indices = index.search(query_emb, top_k)
-    semantic_results = [chunks[i] for i in indices[0]]
 
-    # --- Keyword Search using TF-IDF ---
-    tfidf = TfidfVectorizer().fit(chunks)
-    tfidf_matrix = tfidf.transform(chunks)
-    query_vec = tfidf.transform([query])
-    cosine_scores = (tfidf_matrix * query_vec.T).toarray().flatten()
-    top_keyword_indices = cosine_scores.argsort()[::-1][:top_k]
-    keyword_results = [chunks[i] for i in top_keyword_indices]
+# Build (or reuse) the chunks + indexes for a file, keyed by its content hash:
+# from memory, then from INDEX_DIR, and only then by embedding the file
+def get_corpus_index(uploaded_file, model):
+    cache = get_index_cache()
+    key = (hashlib.sha256(uploaded_file.getvalue()).hexdigest(), EMBED_MODEL)
 
-    # --- Combine Results ---
-    combined = list(set(semantic_results + keyword_results))
-    return combined[:top_k]
+    corpus = cache.get(key)
+    if corpus is not None:
+        return corpus
+
+    directory = os.path.join(INDEX_DIR, f"{key[0]}_{EMBED_MODEL}")
+    if os.path.isdir(directory):
+        try:
+            corpus = load_indexes(directory)
+        except Exception as e:
+            print(f"⚠️  Could not load saved indexes from {directory} ({e}); rebuilding")
+    if corpus is None:
+        extracted = extract_chunks(uploaded_file)
+        if not extracted:
+            return None
+
+        preview, chunks, pages = extracted
+        index, _ = create_faiss_index(chunks, model)
+        keyword_index = create_keyword_index(chunks)
+
+        corpus = CorpusIndex(preview, chunks, index, keyword_index, pages)
+        shutil.rmtree(directory, ignore_errors=True)
+        save_indexes(directory, corpus)
+
+    cache.put(key, corpus)
+    return corpus
+
+
+#  3. Hybrid Search (Semantic + Keyword)
+
+def hybrid_search(query, chunks, model, index, keyword_index, top_k=3,
+                  pool_size=20, method="rrf", weights=None):
+    # Pull a larger candidate pool from each retriever, then rank once
+    pool_size = min(max(pool_size, top_k), len(chunks))
+
+    # --- Semantic Search using FAISS ---
+    # Queries from concurrent sessions share one encode batch
+    query_emb = get_encode_scheduler(model).encode([query])
+    scores, indices = similarity.cosine_search(index, query_emb, pool_size)
+    semantic_hits = [(int(i), float(s)) for s, i in zip(scores[0], indices[0]) if i >= 0]
+
+    # --- Keyword Search using the prebuilt TF-IDF index ---
+    keyword_ids, keyword_scores = keyword_index.search(query, pool_size)
+    keyword_hits = [(int(i), float(s)) for i, s in zip(keyword_ids, keyword_scores)]
+
+    # --- Fuse both rankings (returns FusedHit(chunk_id, score, source_scores)) ---
+    return fuse(
+        {"semantic": semantic_hits, "keyword": keyword_hits},
+        method=method,
+        top_k=top_k,
+        weights=weights,
+    )
+
+
+# Streams a GPT answer grounded on the retrieved chunks
+def stream_answer(query, context_chunks):
+    context = pack_context(context_chunks, model=ANSWER_MODEL).text
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant. Use the context if relevant."},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"},
+    ]
+    return stream_chat(get_llm_client(), ANSWER_MODEL, messages)
 
 
 #  4. Streamlit App UI
@@ -78,29 +203,35 @@ def main():
     uploaded_file = st.file_uploader("Upload your file", type=["txt", "csv", "pdf"])
 
     if uploaded_file:
-        text = extract_text(uploaded_file)
-        if text:
+        model = get_sentence_model(EMBED_MODEL)
+        with st.spinner("Creating text chunks and generating embeddings..."):
+            corpus = get_corpus_index(uploaded_file, model)
+
+        if corpus:
             st.success("✅ File successfully processed!")
             st.write("**Preview:**")
-            st.text_area("Extracted Text", text[:1000] + "...", height=200)
-
-            st.write("Creating text chunks and generating embeddings...")
-            chunks = chunk_text(text)
-            model = SentenceTransformer("all-MiniLM-L6-v2")
-
-            index, embeddings = create_faiss_index(chunks, model)
+            st.text_area("Extracted Text", corpus.preview + "...", height=200)
             st.success("✅ Vector database created successfully!")
 
             query = st.text_input("Ask a question from your data:")
 
             if query:
-                results = hybrid_search(query, chunks, model, index, embeddings)
+                chunks = corpus.chunks
+                results = hybrid_search(query, chunks, model, corpus.index, corpus.keyword_index)
                 st.write("### 🔎 Top Relevant Results:")
-                for i, res in enumerate(results, start=1):
-                    st.markdown(f"**Result {i}:** {res[:300]}...")
+                for i, hit in enumerate(results, start=1):
+                    sources = ", ".join(f"{k}={v:.3f}" for k, v in hit.source_scores.items())
+                    page = f"page {corpus.pages[hit.chunk_id]}; " if corpus.pages else ""
+                    st.markdown(f"**Result {i}** ({page}score {hit.score:.4f}; {sources}): "
+                                f"{chunks[hit.chunk_id][:300]}...")
 
                 st.success("✅ Hybrid search completed!")
 
+                # Optional LLM answer, rendered token by token as it streams in
+                if os.getenv("OPENAI_API_KEY") and st.checkbox("Answer with GPT using these results"):
+                    st.write("### 🤖 Answer:")
+                    st.write_stream(stream_answer(query, [chunks[h.chunk_id] for h in results]))
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds, 0 = never expire
+# Cosine similarity above which a different wording reuses a cached answer; unset = exact only
+SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0") or 0) or None
+
+
+# "What is X?" / "what is  x" -> "what is x"
+def normalize_query(query):
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+# Same answer only if the LLM saw the same model + retrieved context
+def context_fingerprint(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+# LLM answer cache keyed by (normalized query, context fingerprint), with TTL + LRU eviction.
+# With a semantic threshold and an embed_fn, a miss falls back to the closest cached query
+# that was answered from the same context.
+class AnswerCache:
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 semantic_threshold=SEMANTIC_THRESHOLD, embed_fn=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold if embed_fn is not None else None
+        self.embed_fn = embed_fn  # query -> 1-D vector
+        self._data = OrderedDict()  # (query, fingerprint) -> (answer, unit vector or None, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _expired(self, stored_at, now):
+        return self.ttl and now - stored_at > self.ttl
+
+    def _unit(self, query, vector):
+        if vector is None:
+            vector = self.embed_fn(query)
+        vector = np.asarray(vector, dtype="float32").ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _key(self, query, context):
+        return normalize_query(query), context_fingerprint(context)
+
+    # Returns (answer or None, unit query vector if one was computed)
+    def _lookup(self, key, query, vector):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[2], now):
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0], None
+            if self.semantic_threshold is None:
+                self.misses += 1
+                return None, None
+            candidates = [(k, e) for k, e in self._data.items()
+                          if k[1] == key[1] and e[1] is not None and not self._expired(e[2], now)]
+
+        unit, best = None, None
+        if candidates:
+            unit = self._unit(query, vector)
+            sims = np.array([e[1] for _, e in candidates]) @ unit
+            i = int(np.argmax(sims))
+            if sims[i] >= self.semantic_threshold:
+                best = candidates[i]
+
+        with self._lock:
+            if best is None:
+                self.misses += 1
+                return None, unit
+            if best[0] in self._data:
+                self._data.move_to_end(best[0])
+            self.semantic_hits += 1
+            return best[1][0], unit
+
+    def get(self, query, context="", vector=None):
+        return self._lookup(self._key(query, context), query, vector)[0]
+
+    def put(self, query, answer, context="", vector=None, unit=None):
+        key = self._key(query, context)
+        if unit is None and self.semantic_threshold is not None:
+            unit = self._unit(query, vector)
+        with self._lock:
+            self._data[key] = (answer, unit, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    # Cached answer if there is one, otherwise compute_fn() is called and stored.
+    # The query is embedded at most once, and only when the exact lookup misses.
+    def get_or_compute(self, query, compute_fn, context="", vector=None):
+        answer, unit = self._lookup(self._key(query, context), query, vector)
+        if answer is None:
+            answer = compute_fn()
+            self.put(query, answer, context, vector, unit=unit)
+        return answer
+
+    # Streaming variant: yields the cached answer in one piece, or streams stream_fn()
+    # and stores the full text once the stream has been read to the end
+    def stream_or_compute(self, query, stream_fn, context="", vector=None):
+        answer, unit = self._lookup(self._key(query, context), query, vector)
+        if answer is not None:
+            yield answer
+            return
+        parts = []
+        for piece in stream_fn():
+            parts.append(piece)
+            yield piece
+        self.put(query, "".join(parts).strip(), context, vector, unit=unit)
+
+    def stats(self):
+        total = self.hits + self.semantic_hits + self.misses
+        return {"entries": len(self._data), "hits": self.hits,
+                "semantic_hits": self.semantic_hits, "misses": self.misses,
+                "hit_rate": round((self.hits + self.semantic_hits) / total, 3) if total else 0.0}
@@ -0,0 +1,93 @@
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Queries come one per line, either plain text or JSON like {"id": ..., "query": ...}.
+# Use "-" to read from stdin.
+def read_queries(path):
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                obj = json.loads(line)
+                yield obj.get("id", n), obj["query"]
+            else:
+                yield n, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Runs handle_chunk on the next chunk in a background thread while the caller
+# works on the current one. Yields (chunk, handle_chunk(queries)).
+def _prefetched(chunks, handle_chunk):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None
+        for chunk in chunks:
+            future = pool.submit(handle_chunk, [query for _, query in chunk])
+            if pending is not None:
+                yield pending[0], pending[1].result()
+            pending = (chunk, future)
+        if pending is not None:
+            yield pending[0], pending[1].result()
+
+
+# Streams queries through handle_chunk(list_of_queries) -> list_of_result_dicts,
+# one chunk at a time, and writes one JSON line per query.
+# With finish_chunk(queries, handled) -> list_of_result_dicts (e.g. LLM answers), retrieval
+# for the next chunk runs while the current chunk is being finished.
+def run_batch(input_path, output_path, handle_chunk, chunk_size=256, finish_chunk=None):
+    out = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    start = time.perf_counter()
+    total = 0
+    chunks = iter_chunks(read_queries(input_path), chunk_size)
+    try:
+        if finish_chunk is None:
+            handled = ((chunk, handle_chunk([query for _, query in chunk])) for chunk in chunks)
+        else:
+            handled = _prefetched(chunks, handle_chunk)
+        for chunk, results in handled:
+            ids = [qid for qid, _ in chunk]
+            queries = [query for _, query in chunk]
+            if finish_chunk is not None:
+                results = finish_chunk(queries, results)
+            for qid, query, result in zip(ids, queries, results):
+                record = {"id": qid, "query": query}
+                record.update(result)
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            total += len(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Answered {total} queries in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:.1f} queries/s)", file=sys.stderr)
+
+
+def batch_arg_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--batch", metavar="QUERIES",
+                        help="run queries from a file ('-' for stdin) instead of the prompt")
+    parser.add_argument("--output", default="batch_results.jsonl",
+                        help="JSONL output path ('-' for stdout)")
+    parser.add_argument("--chunk-size", type=int, default=256,
+                        help="queries encoded and searched together")
+    return parser
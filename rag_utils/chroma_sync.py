@@ -0,0 +1,76 @@
+import os
+import time
+
+from rag_utils.batch_query import iter_chunks
+from rag_utils.embedding_cache import cached_encode
+from rag_utils.pinecone_sync import content_id
+
+# Chroma caps the records per call (a few thousand, depends on the SQLite build)
+CHROMA_UPSERT_BATCH = int(os.getenv("CHROMA_UPSERT_BATCH", "1000"))
+LIST_PAGE = 10000  # ids fetched per get() while listing the collection
+
+
+def _existing_ids(collection):
+    ids, offset = set(), 0
+    while True:
+        page = collection.get(include=[], limit=LIST_PAGE, offset=offset)["ids"]
+        ids.update(page)
+        if len(page) < LIST_PAGE:
+            return ids
+        offset += LIST_PAGE
+
+
+def _remember_model(collection, model_name):
+    # hnsw:* settings can't be passed to modify(), even unchanged
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    metadata["embed_model"] = model_name
+    collection.modify(metadata=metadata)
+
+
+# Makes the collection hold exactly `records` ((text, metadata) pairs, metadata a dict or
+# None). Ids are content hashes, so chunks already in the collection are skipped without
+# embedding; new ones are embedded and upserted in batches of batch_size, and ids no
+# longer produced (including the old chunk_0 / row_0 ids) are deleted.
+# full=True (or CHROMA_FULL_SYNC=1) re-embeds everything.
+def sync_collection(collection, model, model_name, records, prefix="chunk",
+                    batch_size=CHROMA_UPSERT_BATCH, full=False):
+    start = time.perf_counter()
+    full = full or os.getenv("CHROMA_FULL_SYNC") == "1"
+    previous_model = (collection.metadata or {}).get("embed_model")
+    if previous_model and previous_model != model_name:
+        full = True  # vectors from another model can't be reused
+    existing = _existing_ids(collection)
+    known = set() if full else existing
+
+    current = set()
+
+    def new_records():
+        for text, metadata in records:
+            vid = content_id(prefix, text, metadata)
+            if vid in current:
+                continue  # duplicate chunk
+            current.add(vid)
+            if vid not in known:
+                yield vid, text, metadata
+
+    added = 0
+    for batch in iter_chunks(new_records(), batch_size):
+        texts = [text for _, text, _ in batch]
+        metadatas = [metadata for _, _, metadata in batch]
+        collection.upsert(
+            ids=[vid for vid, _, _ in batch],
+            documents=texts,
+            embeddings=cached_encode(model, model_name, texts),
+            metadatas=None if all(m is None for m in metadatas) else metadatas,
+        )
+        added += len(batch)
+
+    stale = list(existing - current)
+    for i in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[i:i + batch_size])
+
+    if previous_model != model_name:
+        _remember_model(collection, model_name)
+
+    return {"total": len(current), "added": added, "unchanged": len(current) - added,
+            "deleted": len(stale), "seconds": round(time.perf_counter() - start, 3)}
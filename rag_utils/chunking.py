@@ -0,0 +1,99 @@
+import os
+import re
+from collections import deque, namedtuple
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))  # capped by the encoder's max_seq_length
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+COUNT_BATCH = 256  # sentences tokenized per tokenizer call
+
+# A chunk is a span of the source text: text[start:end]
+Chunk = namedtuple("Chunk", ["start", "end", "tokens"])
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*")
+_WORD = re.compile(r"\S+")
+
+
+# Returns count(list_of_texts) -> list of token counts, using the SentenceTransformer's
+# own tokenizer when a model is given (a rough word-based estimate otherwise)
+def token_counter(model=None):
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return lambda texts: [max(1, round(len(t.split()) * 1.3)) for t in texts]
+    return lambda texts: [len(ids) for ids in
+                          tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]]
+
+
+# Longest chunk the encoder sees in full (room left for [CLS] / [SEP])
+def max_chunk_tokens(model=None, max_tokens=CHUNK_TOKENS):
+    seq_len = getattr(model, "max_seq_length", None) or max_tokens
+    return max(1, min(seq_len, max_tokens) - 2)
+
+
+def _sentence_spans(text, start=0, end=None):
+    end = len(text) if end is None else end
+    pos = start
+    for m in _SENTENCE_END.finditer(text, start, end):
+        if m.start() > pos:
+            yield pos, m.start()
+        pos = m.end()
+    if pos < end and text[pos:end].strip():
+        yield pos, end
+
+
+def _word_spans(text, start, end):
+    for m in _WORD.finditer(text, start, end):
+        yield m.start(), m.end()
+
+
+def _counted(text, spans, count):
+    batch = []
+    for span in spans:
+        batch.append(span)
+        if len(batch) >= COUNT_BATCH:
+            yield from zip(batch, count([text[s:e] for s, e in batch]))
+            batch = []
+    if batch:
+        yield from zip(batch, count([text[s:e] for s, e in batch]))
+
+
+# (start, end, tokens) units to pack: sentences, with sentences longer than
+# the limit broken into words
+def _units(text, count, limit, sentence_boundaries):
+    if not sentence_boundaries:
+        for (s, e), n in _counted(text, _word_spans(text, 0, len(text)), count):
+            yield s, e, n
+        return
+    for (s, e), n in _counted(text, _sentence_spans(text), count):
+        if n <= limit:
+            yield s, e, n
+        else:
+            for (ws, we), wn in _counted(text, _word_spans(text, s, e), count):
+                yield ws, we, wn
+
+
+# Streams chunks of at most max_tokens encoder tokens (default: what the model can
+# encode without truncating). Chunks end on sentence boundaries where possible and
+# start with up to `overlap` tokens from the end of the previous chunk.
+def iter_chunks(text, model=None, max_tokens=None, overlap=CHUNK_OVERLAP_TOKENS,
+                sentence_boundaries=True):
+    limit = max_tokens or max_chunk_tokens(model)
+    overlap = min(overlap, limit // 2)
+    count = token_counter(model)
+
+    window = deque()  # units of the chunk being built
+    total = 0
+    for unit in _units(text, count, limit, sentence_boundaries):
+        if window and total + unit[2] > limit:
+            yield Chunk(window[0][0], window[-1][1], total)
+            # carry the tail of this chunk into the next one as overlap
+            while window and (total > overlap or total + unit[2] > limit):
+                total -= window.popleft()[2]
+        window.append(unit)
+        total += unit[2]
+    if window:
+        yield Chunk(window[0][0], window[-1][1], total)
+
+
+# Convenience for callers that need the chunk strings
+def chunk_text(text, model=None, **kwargs):
+    return [text[c.start:c.end] for c in iter_chunks(text, model, **kwargs)]
@@ -0,0 +1,92 @@
+import os
+import re
+from functools import lru_cache
+from collections import namedtuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKENS", "2000"))
+SHINGLE_SIZE = 5  # words per shingle when comparing chunks for overlap
+
+# texts: the packed (possibly last-truncated) texts, best first
+# indices: position of each packed text in the caller's list
+PackedContext = namedtuple("PackedContext",
+                           ["texts", "indices", "text", "tokens", "duplicates", "truncated"])
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens, model="gpt-4o-mini"):
+    if tiktoken is None:
+        return text[:max(max_tokens - 1, 0) * 4]  # inverse of the estimate above
+    enc = _encoding(model)
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+# Fills the prompt context with the best chunks up to `budget` tokens:
+#   - chunks are taken by descending score (input order when no scores are given)
+#   - a chunk mostly contained in an already chosen one (shared shingles / smaller
+#     chunk >= overlap) is skipped, so overlapping windows aren't paid for twice;
+#     overlap=None turns this off (for structured records, which are already
+#     unique and can differ in a single field)
+#   - the first chunk that doesn't fit is cut to the remaining budget if at least
+#     min_tokens are left, then packing stops
+def pack_context(texts, scores=None, budget=CONTEXT_TOKEN_BUDGET, model="gpt-4o-mini",
+                 separator="\n\n", overlap=0.8, min_tokens=50):
+    order = list(range(len(texts)))
+    if scores is not None:
+        order.sort(key=lambda i: -scores[i])
+
+    sep_tokens = count_tokens(separator, model)
+    chosen, chosen_shingles = [], []
+    used, duplicates, truncated = 0, 0, False
+    for i in order:
+        text = texts[i].strip()
+        if not text:
+            continue
+        shingles = _shingles(text) if overlap is not None else None
+        if overlap is not None and any(
+                len(shingles & other) >= overlap * min(len(shingles), len(other))
+                for other in chosen_shingles):
+            duplicates += 1
+            continue
+
+        cost = count_tokens(text, model) + (sep_tokens if chosen else 0)
+        if used + cost > budget:
+            remaining = budget - used - (sep_tokens if chosen else 0)
+            if remaining >= min_tokens:
+                text = truncate_tokens(text, remaining, model)
+                chosen.append((i, text))
+                used += count_tokens(text, model) + (sep_tokens if len(chosen) > 1 else 0)
+                truncated = True
+            break
+
+        chosen.append((i, text))
+        chosen_shingles.append(shingles)
+        used += cost
+
+    packed_texts = [text for _, text in chosen]
+    return PackedContext(packed_texts, [i for i, _ in chosen], separator.join(packed_texts),
+                         used, duplicates, truncated)
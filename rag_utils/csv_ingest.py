@@ -0,0 +1,68 @@
+import os
+import math
+from collections import namedtuple
+import pandas as pd
+
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))  # rows read and rendered at a time
+
+# rows: row numbers in the file (0-based, header excluded); metadata: list of dicts or None
+CsvBatch = namedtuple("CsvBatch", ["rows", "texts", "metadata"])
+
+
+# One text per row, built column by column with vectorized string ops
+# (no per-row Python). with_names renders "col: value"; skip_na leaves out
+# missing values instead of writing "nan".
+def render_rows(df, columns=None, with_names=True, sep=" | ", skip_na=True):
+    columns = list(df.columns) if columns is None else list(columns)
+    text = pd.Series("", index=df.index, dtype=object)
+    for col in columns:
+        values = df[col]
+        # pandas 3 keeps NaN through astype(str); render it as "nan" like str() does
+        piece = sep + (f"{col}: " if with_names else "") + values.astype(str).fillna("nan")
+        if skip_na:
+            piece = piece.where(values.notna(), "")
+        text = text + piece
+    return text.str[len(sep):]
+
+
+# Cells are read as text; metadata numbers get their type back per value, so the
+# same cell gives the same metadata whichever chunk it is in
+def _parse_value(text):
+    if not isinstance(text, str) or "_" in text:
+        return text
+    for cast in (int, float):
+        try:
+            value = cast(text)
+        except ValueError:
+            continue
+        return value if cast is int or math.isfinite(value) else text
+    return text
+
+
+def _metadata(df, columns):
+    # missing values become None (NaN is not valid JSON / vector-store metadata)
+    values = df[list(columns)].astype(object)
+    records = values.where(values.notna(), None).to_dict("records")
+    return [{k: _parse_value(v) for k, v in record.items()} for record in records]
+
+
+# Streams a CSV of any size: yields CsvBatch per `chunksize` rows. Only the chosen
+# text / metadata columns are parsed; rows rendering shorter than min_chars are skipped.
+# Cells are read as strings: pandas infers dtypes per chunk, so an integer column would
+# render as "4" or "4.0" (and get a different content id) depending on where chunks break.
+def iter_csv_rows(path_or_file, text_columns=None, metadata_columns=None,
+                  chunksize=CSV_CHUNK_ROWS, with_names=True, sep=" | ", skip_na=True,
+                  min_chars=1, **read_csv_kwargs):
+    usecols = None
+    if text_columns is not None:
+        usecols = list(dict.fromkeys(list(text_columns) + list(metadata_columns or [])))
+    read_csv_kwargs.setdefault("dtype", str)
+    reader = pd.read_csv(path_or_file, usecols=usecols, chunksize=chunksize, **read_csv_kwargs)
+    for df in reader:
+        texts = render_rows(df, text_columns, with_names, sep, skip_na)
+        keep = texts.str.strip().str.len() >= min_chars
+        df, texts = df[keep], texts[keep]
+        if texts.empty:
+            continue
+        metadata = _metadata(df, metadata_columns) if metadata_columns else None
+        yield CsvBatch(df.index.to_numpy(), texts.tolist(), metadata)
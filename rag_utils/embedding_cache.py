@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+# Shared on-disk cache used by every ingest script (override with EMBEDDING_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".embedding_cache"),
+)
+KEY_SIZE = 16  # bytes per blake2b key
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_digest(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+
+def text_hash(text):
+    return text_digest(text).hex()
+
+
+# Exclusive lock shared by every process using the cache directory
+@contextmanager
+def _file_lock(path):
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# One cache per model: vectors.f32 holds float32 rows (memory-mapped for reads)
+# and keys.bin holds the 16-byte text key of each row, in the same order.
+# Several processes (scripts, the Streamlit app, the retrieval server) may share
+# it: appends happen under a file lock after picking up rows other processes added.
+class EmbeddingCache:
+    def __init__(self, model_name, cache_dir=None):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, safe_name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.keys_path = os.path.join(self.dir, "keys.bin")
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, "lock")
+
+        self.dim = None
+        self._rows = {}
+        self._n = 0  # rows in the files (a key appended twice by racing processes counts twice)
+        self._vectors = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def __len__(self):
+        return len(self._rows)
+
+    # Picks up rows appended since the last call, by this or another process
+    def _refresh(self):
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        if not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return
+        # Vectors are written before keys, so a key always has its row;
+        # trailing bytes from an interrupted write are ignored.
+        n_vectors = os.path.getsize(self.vectors_path) // (4 * self.dim)
+        n = min(os.path.getsize(self.keys_path) // KEY_SIZE, n_vectors)
+        if n <= self._n:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._n * KEY_SIZE)
+            raw = f.read((n - self._n) * KEY_SIZE)
+        for i in range(len(raw) // KEY_SIZE):
+            self._rows.setdefault(raw[i * KEY_SIZE:(i + 1) * KEY_SIZE], self._n + i)
+        self._n += len(raw) // KEY_SIZE
+
+    def _matrix(self):
+        if self._vectors is None or self._vectors.shape[0] < self._n:
+            self._vectors = np.memmap(self.vectors_path, dtype="float32", mode="r",
+                                      shape=(self._n, self.dim))
+        return self._vectors
+
+    def _append(self, keys, vectors):
+        with _file_lock(self.lock_path):
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+
+            # another process may have stored some of these meanwhile
+            new = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not new:
+                return
+            keys = [keys[i] for i in new]
+            vectors = np.ascontiguousarray(vectors[new], dtype="float32")
+
+            start = self._n
+            with open(self.vectors_path, "ab") as f:
+                f.seek(start * 4 * self.dim)
+                f.truncate()
+                f.write(vectors.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.seek(start * KEY_SIZE)
+                f.truncate()
+                f.write(b"".join(keys))
+            for i, key in enumerate(keys):
+                self._rows[key] = start + i
+            self._n = start + len(keys)
+
+    # Returns embeddings for texts, calling encode_fn(list_of_texts) only for misses
+    def encode(self, texts, encode_fn):
+        texts = list(texts)
+        keys = [text_digest(t) for t in texts]
+
+        with self._lock:
+            self._refresh()
+            missing = {}
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in missing:
+                    missing[key] = i
+
+            if missing:
+                new_vectors = np.asarray(encode_fn([texts[i] for i in missing.values()]),
+                                         dtype="float32")
+                self._append(list(missing), new_vectors)
+
+            if not texts:
+                return np.empty((0, self.dim or 0), dtype="float32")
+            rows = np.fromiter((self._rows[k] for k in keys), dtype=np.int64, count=len(keys))
+            return np.array(self._matrix()[rows])
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(model_name, cache_dir=None):
+    key = (model_name, cache_dir)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(model_name, cache_dir)
+        return _caches[key]
+
+
+# Drop-in replacement for model.encode(texts) on a SentenceTransformer
+def cached_encode(model, model_name, texts, cache_dir=None):
+    cache = get_cache(model_name, cache_dir)
+    return cache.encode(texts, lambda batch: model.encode(batch, convert_to_numpy=True))
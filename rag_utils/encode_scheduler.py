@@ -0,0 +1,132 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+MAX_BATCH_SIZE = int(os.getenv("ENCODE_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.getenv("ENCODE_MAX_WAIT_MS", "5"))
+
+
+# Micro-batching for query encoding: concurrent callers submit single texts,
+# a worker thread collects them until the batch is full or the oldest one has
+# waited max_wait_ms, runs one encode, and resolves each caller's future.
+class EncodeScheduler:
+    def __init__(self, encode_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.encode_fn = encode_fn  # list[str] -> 2-D array
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.queue_waits = deque(maxlen=10_000)  # seconds from submit to encode start
+        self.encode_times = deque(maxlen=1_000)  # seconds per batch encode
+
+        self._worker = threading.Thread(target=self._run, name="encode-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, text):
+        if self._closed:
+            raise RuntimeError("EncodeScheduler is closed")
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    # Drop-in for model.encode(texts): each text is queued on its own so it can
+    # share a batch with other callers' queries
+    def encode(self, texts, timeout=None):
+        if isinstance(texts, str):
+            return self.submit(texts).result(timeout)
+        futures = [self.submit(t) for t in texts]
+        return np.vstack([f.result(timeout) for f in futures])
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let the loop see the shutdown after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Skip callers that gave up before their batch started
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.encode_fn([text for text, _, _ in batch]), dtype="float32")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.queue_waits.extend(start - submitted for _, _, submitted in batch)
+                self.encode_times.append(elapsed)
+
+    def stats(self):
+        with self._stats_lock:
+            result = {"batches": self.batches, "items": self.items,
+                      "max_batch_size": self.max_batch_size,
+                      "pending": self._queue.qsize()}
+            if self.batches:
+                mean_size = self.items / self.batches
+                result["mean_batch_size"] = round(mean_size, 2)
+                result["batch_fill"] = round(mean_size / self.max_batch_size, 3)
+            if self.queue_waits:
+                waits = np.array(self.queue_waits) * 1000
+                result["queue_wait_p50_ms"] = round(float(np.percentile(waits, 50)), 3)
+                result["queue_wait_p99_ms"] = round(float(np.percentile(waits, 99)), 3)
+            if self.encode_times:
+                result["encode_mean_ms"] = round(float(np.mean(self.encode_times)) * 1000, 3)
+        return result
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+
+# One scheduler per loaded model, shared by every thread in the process
+_schedulers = {}
+_lock = threading.Lock()
+
+
+def get_encode_scheduler(model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+    with _lock:
+        entry = _schedulers.get(id(model))
+        if entry is None:
+            scheduler = EncodeScheduler(
+                lambda texts: model.encode(texts, convert_to_numpy=True, batch_size=len(texts)),
+                max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+            entry = (model, scheduler)  # keep the model alive while its id is a key
+            _schedulers[id(model)] = entry
+    return entry[1]
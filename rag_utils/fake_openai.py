@@ -0,0 +1,83 @@
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+import numpy as np
+
+
+# Offline stand-in for the OpenAI client, for running the pipelines without
+# network access. Embeddings are deterministic per text; chat answers are canned.
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message="Rate limit reached (fake)", retry_after=None):
+        super().__init__(message)
+        headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def fake_embedding(text, dim=1536):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return vec / np.linalg.norm(vec)
+
+
+class FakeEmbeddings:
+    def __init__(self, dim=1536, rate_limit_every=0):
+        self.dim = dim
+        self.rate_limit_every = rate_limit_every  # raise a 429 on every Nth call
+        self.calls = 0
+        self.inputs = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, input, **kwargs):
+        texts = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.calls += 1
+            if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+                raise FakeRateLimitError(retry_after=0.01)
+            self.inputs += len(texts)
+        data = [
+            SimpleNamespace(index=i, embedding=fake_embedding(t, self.dim).tolist())
+            for i, t in enumerate(texts)
+        ]
+        return SimpleNamespace(data=data, model=model)
+
+
+# Chat completions echo a short canned answer built from the last user message.
+# With stream=True the answer arrives word by word, the latency spread across the words.
+class FakeCompletions:
+    def __init__(self, latency=0.0):
+        self.latency = latency  # seconds, to mimic a slow LLM
+        self.calls = 0
+
+    def _stream(self, model, content):
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            delta = SimpleNamespace(role="assistant" if i == 0 else None,
+                                    content=word if i == 0 else " " + word)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)],
+                                  model=model)
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None),
+                                                       finish_reason="stop")], model=model)
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        question = messages[-1]["content"].strip().splitlines()[-1][:200]
+        content = f"[stub {model}] Answer to: {question}"
+        if stream:
+            return self._stream(model, content)
+        if self.latency:
+            time.sleep(self.latency)
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message,
+                                                        finish_reason="stop")],
+                               model=model)
+
+
+class FakeOpenAI:
+    def __init__(self, dim=1536, rate_limit_every=0, chat_latency=0.0):
+        self.embeddings = FakeEmbeddings(dim=dim, rate_limit_every=rate_limit_every)
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency=chat_latency))
@@ -0,0 +1,96 @@
+import json
+import time
+import threading
+import numpy as np
+
+
+# In-memory stand-in for a Pinecone index (cosine metric), for running the Pinecone
+# scripts and the upsert pipeline offline. Enforces the per-request limits of the
+# real service and can fail every Nth upsert to exercise retries.
+class FakePineconeError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"({status}) {message}")
+        self.status = status
+
+
+class FakePineconeIndex:
+    def __init__(self, max_request_vectors=1000, max_request_bytes=2 * 1024 * 1024,
+                 fail_every=0, latency=0.0):
+        self.max_request_vectors = max_request_vectors
+        self.max_request_bytes = max_request_bytes
+        self.fail_every = fail_every  # raise a 429 on every Nth upsert call
+        self.latency = latency  # seconds per request, to mimic the network
+        self.upsert_calls = 0
+        self._namespaces = {}  # namespace -> {id: (unit vector, metadata)}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if len(vectors) > self.max_request_vectors:
+            raise FakePineconeError(400, f"{len(vectors)} vectors in one request "
+                                         f"(max {self.max_request_vectors})")
+        size = len(json.dumps(vectors, default=float))
+        if size > self.max_request_bytes:
+            raise FakePineconeError(400, f"request of {size} bytes "
+                                         f"(max {self.max_request_bytes})")
+        with self._lock:
+            self.upsert_calls += 1
+            if self.fail_every and self.upsert_calls % self.fail_every == 0:
+                raise FakePineconeError(429, "Too Many Requests (fake)")
+            store = self._namespaces.setdefault(namespace or "", {})
+            for v in vectors:
+                values = np.asarray(v["values"], dtype="float32")
+                norm = np.linalg.norm(values)
+                store[v["id"]] = (values / norm if norm else values, dict(v.get("metadata") or {}))
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=10, namespace=None, include_metadata=False,
+              include_values=False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            items = list(self._namespaces.get(namespace or "", {}).items())
+        matches = []
+        if items:
+            q = np.asarray(vector, dtype="float32")
+            q = q / (np.linalg.norm(q) or 1.0)
+            scores = np.stack([vec for _, (vec, _) in items]) @ q
+            for i in np.argsort(-scores, kind="stable")[:top_k]:
+                vid, (vec, metadata) = items[i]
+                match = {"id": vid, "score": float(scores[i])}
+                if include_metadata:
+                    match["metadata"] = metadata
+                if include_values:
+                    match["values"] = vec.tolist()
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace=None):
+        with self._lock:
+            store = self._namespaces.get(namespace or "", {})
+            found = {i: {"id": i, "values": store[i][0].tolist(), "metadata": store[i][1]}
+                     for i in ids if i in store}
+        return {"vectors": found, "namespace": namespace or ""}
+
+    # Pages of ids starting with prefix, like the serverless list() call
+    def list(self, prefix="", namespace=None, limit=100):
+        with self._lock:
+            ids = sorted(i for i in self._namespaces.get(namespace or "", {}) if i.startswith(prefix))
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def delete(self, ids=None, namespace=None, delete_all=False):
+        with self._lock:
+            store = self._namespaces.get(namespace or "", {})
+            if delete_all:
+                store.clear()
+            for i in ids or []:
+                store.pop(i, None)
+        return {}
+
+    def describe_index_stats(self):
+        with self._lock:
+            namespaces = {ns: {"vector_count": len(store)} for ns, store in self._namespaces.items()}
+        return {"namespaces": namespaces,
+                "total_vector_count": sum(n["vector_count"] for n in namespaces.values())}
@@ -0,0 +1,52 @@
+from collections import namedtuple
+
+# A fused hit keeps the per-retriever scores so callers can show / debug them
+FusedHit = namedtuple("FusedHit", ["chunk_id", "score", "source_scores"])
+
+
+# ranked_lists: {source_name: [(chunk_id, score), ...]} ordered best first,
+# where a higher score is always better.
+def reciprocal_rank_fusion(ranked_lists, k=60, weights=None):
+    fused = {}
+    for source, hits in ranked_lists.items():
+        weight = (weights or {}).get(source, 1.0)
+        for rank, (chunk_id, _) in enumerate(hits, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (k + rank)
+    return fused
+
+
+# Min-max normalize each source to [0, 1] and take a weighted sum
+def weighted_fusion(ranked_lists, weights=None):
+    fused = {}
+    for source, hits in ranked_lists.items():
+        if not hits:
+            continue
+        weight = (weights or {}).get(source, 1.0)
+        scores = [score for _, score in hits]
+        low, high = min(scores), max(scores)
+        span = high - low
+        for chunk_id, score in hits:
+            norm = (score - low) / span if span > 0 else 1.0
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight * norm
+    return fused
+
+
+def fuse(ranked_lists, method="rrf", top_k=3, weights=None, rrf_k=60):
+    if method == "rrf":
+        fused = reciprocal_rank_fusion(ranked_lists, k=rrf_k, weights=weights)
+    elif method == "weighted":
+        fused = weighted_fusion(ranked_lists, weights=weights)
+    else:
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    source_scores = {}
+    for source, hits in ranked_lists.items():
+        for chunk_id, score in hits:
+            source_scores.setdefault(chunk_id, {})[source] = float(score)
+
+    # Sort by fused score, then chunk id, so ties come out in a stable order
+    ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+    return [
+        FusedHit(chunk_id, score, source_scores[chunk_id])
+        for chunk_id, score in ranked[:top_k]
+    ]
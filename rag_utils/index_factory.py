@@ -0,0 +1,214 @@
+import os
+import time
+import numpy as np
+import faiss
+
+# Index choice can be forced per deployment: auto | flat | ivf | ivfpq | hnsw
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# Filtered HNSW searches over at most this many ids scan them exactly instead
+EXACT_FILTER_MAX = int(os.getenv("FAISS_EXACT_FILTER_MAX", "4096"))
+
+# "auto" thresholds (number of vectors)
+FLAT_MAX = 50_000
+IVF_FLAT_MAX = 1_000_000
+
+METRICS = {"l2": faiss.METRIC_L2, "ip": faiss.METRIC_INNER_PRODUCT}
+
+
+def choose_index_type(n, kind=None):
+    kind = kind or INDEX_TYPE
+    if kind != "auto":
+        return kind
+    if n <= FLAT_MAX:
+        return "flat"
+    if n <= IVF_FLAT_MAX:
+        return "ivf"
+    return "ivfpq"
+
+
+def needs_training(kind):
+    return kind in ("ivf", "ivfpq")
+
+
+def supports_removal(kind):
+    return kind != "hnsw"
+
+
+# ~4*sqrt(n) lists, but at least 39 training points per centroid
+def default_nlist(n, n_train=None):
+    nlist = int(4 * np.sqrt(max(n, 1)))
+    return max(1, min(nlist, (n_train or n) // 39))
+
+
+# PQ sub-quantizers must divide dim; aim for ~8 dims each, at most 64
+def default_pq_m(dim):
+    for m in range(min(64, max(1, dim // 8)), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+# Random subset used to train IVF coarse centroids (FAISS wants 39-256 per list)
+def training_sample(embeddings, nlist, per_list=256, seed=0):
+    n = len(embeddings)
+    size = min(n, nlist * per_list)
+    if size == n:
+        return embeddings
+    rows = np.random.default_rng(seed).choice(n, size=size, replace=False)
+    return embeddings[np.sort(rows)]
+
+
+# Empty (but trained, if needed) index; n_expected sizes the IVF lists
+def new_index(dim, kind="flat", metric="l2", n_expected=None, train_vectors=None,
+              nlist=None, pq_m=None, hnsw_m=32):
+    faiss_metric = METRICS[metric]
+
+    if kind == "flat":
+        return faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = 200
+        index.hnsw.efSearch = EF_SEARCH
+        return index
+
+    if not needs_training(kind):
+        raise ValueError(f"Unknown FAISS index type: {kind}")
+    if train_vectors is None:
+        raise ValueError(f"{kind} index needs training vectors")
+
+    n_expected = n_expected or len(train_vectors)
+    nlist = nlist or default_nlist(n_expected, len(train_vectors))
+    quantizer = faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m or default_pq_m(dim), 8, faiss_metric)
+
+    index.train(np.ascontiguousarray(training_sample(train_vectors, nlist), dtype="float32"))
+    index.nprobe = min(NPROBE, nlist)
+    return index
+
+
+# Pick, train and fill an index for the given embeddings
+def build_index(embeddings, kind=None, metric="l2", **kwargs):
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    kind = choose_index_type(len(embeddings), kind)
+    index = new_index(embeddings.shape[1], kind, metric, n_expected=len(embeddings),
+                      train_vectors=embeddings if needs_training(kind) else None, **kwargs)
+    index.add(embeddings)
+    return index
+
+
+# Restricts a search to the given ids (IndexIDMap ids when the index is wrapped).
+# Sparse sets use a hashed IDSelectorBatch, dense ones a bitmap over the id range.
+def id_selector(ids):
+    ids = np.unique(np.asarray(ids, dtype="int64"))
+    if len(ids) and len(ids) * 128 > ids[-1]:
+        bits = np.zeros(int(ids[-1]) + 1, dtype=bool)
+        bits[ids] = True
+        return faiss.IDSelectorBitmap(np.packbits(bits, bitorder="little"))
+    return faiss.IDSelectorBatch(ids)
+
+
+def _inner(index):
+    inner = index.index if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    return faiss.downcast_index(inner)
+
+
+# Per-query knobs, passed as SearchParameters so concurrent queries don't race.
+# With a selector, IVF probes and HNSW explores 1/selectivity times more (up to
+# everything), so about as many eligible vectors are seen as in an unfiltered search.
+def search_params(index, nprobe=None, ef_search=None, sel=None, selectivity=1.0, k=None):
+    inner = _inner(index)
+    boost = 1.0 / max(selectivity, 1e-9)
+    if isinstance(inner, faiss.IndexIVF):
+        nprobe = int(np.ceil((nprobe or NPROBE) * boost))
+        return faiss.SearchParametersIVF(nprobe=min(nprobe, inner.nlist), sel=sel)
+    if isinstance(inner, faiss.IndexHNSW):
+        ef = max(ef_search or EF_SEARCH, k or 0)
+        if sel is not None:
+            ef = min(int(np.ceil(ef * boost)), max(index.ntotal, ef))
+        return faiss.SearchParametersHNSW(efSearch=ef, sel=sel)
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+# ids: only these vectors are considered (a pre-filter, not oversample-and-drop);
+# k is capped at len(ids)
+def search(index, queries, k, nprobe=None, ef_search=None, ids=None):
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    sel, selectivity = None, 1.0
+    if ids is not None:
+        ids = np.unique(np.asarray(ids, dtype="int64"))
+        if len(ids) == 0:
+            return (np.empty((len(queries), 0), dtype="float32"),
+                    np.empty((len(queries), 0), dtype="int64"))
+        k = min(k, len(ids))
+        if (isinstance(_inner(index), faiss.IndexHNSW) and len(ids) <= EXACT_FILTER_MAX
+                and not type(index) is faiss.IndexIDMap):  # IndexIDMap can't reconstruct
+            return _exact_search(index, queries, k, ids)
+        sel = id_selector(ids)
+        selectivity = len(ids) / max(index.ntotal, 1)
+    params = search_params(index, nprobe, ef_search, sel, selectivity, k)
+    if params is None:
+        return index.search(queries, k)
+    return index.search(queries, k, params=params)
+
+
+# Brute force over just the given ids (graph search can't reach a few scattered ones)
+def _exact_search(index, queries, k, ids):
+    if isinstance(index, faiss.IndexIDMap2):
+        ids = ids[np.isin(ids, faiss.vector_to_array(index.id_map))]
+    else:
+        ids = ids[(ids >= 0) & (ids < index.ntotal)]
+    if len(ids) == 0:
+        return (np.full((len(queries), k), np.inf, dtype="float32"),
+                np.full((len(queries), k), -1, dtype="int64"))
+    vectors = index.reconstruct_batch(ids)
+    distances, rows = faiss.knn(queries, vectors, k, metric=index.metric_type)
+    return distances, np.where(rows >= 0, ids[np.maximum(rows, 0)], -1)
+
+
+# Recall@k of `index` against exact (flat) search, plus mean query latency
+def evaluate_recall(index, embeddings, queries=None, k=10, metric="l2", n_queries=100,
+                    nprobe=None, ef_search=None, seed=0):
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    if queries is None:
+        rows = np.random.default_rng(seed).choice(
+            len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+        queries = embeddings[rows]
+    k = min(k, len(embeddings))
+
+    flat = new_index(embeddings.shape[1], "flat", metric)
+    flat.add(embeddings)
+    _, truth = flat.search(queries, k)
+
+    start = time.perf_counter()
+    _, found = search(index, queries, k, nprobe=nprobe, ef_search=ef_search)
+    elapsed = time.perf_counter() - start
+
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return {
+        "recall": hits / float(truth.size),
+        "ms_per_query": 1000 * elapsed / len(queries),
+    }
+
+
+def describe(index):
+    inner = index.index if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    return type(faiss.downcast_index(inner)).__name__
+
+
+# One-line summary for the scripts; approximate indexes also report recall
+def print_index_report(index, embeddings, metric="l2"):
+    name = describe(index)
+    if name.startswith("IndexFlat"):
+        print(f"🗂️  FAISS index: {name} ({index.ntotal} vectors, exact search)")
+        return
+    stats = evaluate_recall(index, embeddings, metric=metric)
+    print(f"🗂️  FAISS index: {name} ({index.ntotal} vectors) | "
+          f"recall@10 vs flat = {stats['recall']:.3f}, {stats['ms_per_query']:.2f} ms/query")
@@ -0,0 +1,48 @@
+import pickle
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+# TF-IDF keyword index: fitted once per corpus, reused for every query.
+# TfidfVectorizer L2-normalizes rows, so one sparse mat-vec gives cosine scores.
+class KeywordIndex:
+    def __init__(self, vectorizer, matrix):
+        self.vectorizer = vectorizer
+        self.matrix = matrix.tocsr()
+
+    @classmethod
+    def build(cls, chunks):
+        vectorizer = TfidfVectorizer()
+        matrix = vectorizer.fit_transform(chunks)
+        return cls(vectorizer, matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def scores(self, query):
+        query_vec = self.vectorizer.transform([query])
+        return (self.matrix @ query_vec.T).toarray().ravel()
+
+    def search(self, query, top_k=3):
+        scores = self.scores(query)
+        top_k = min(top_k, len(scores))
+        if top_k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # argpartition keeps this O(n) instead of sorting every chunk
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        # Chunks sharing no terms with the query are not keyword hits
+        top = top[scores[top] > 0]
+        return top, scores[top]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump({"vectorizer": self.vectorizer, "matrix": self.matrix}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        return cls(data["vectorizer"], data["matrix"])
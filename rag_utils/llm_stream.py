@@ -0,0 +1,29 @@
+import sys
+import time
+
+
+# Yields the text of a chat completion piece by piece as the API sends it
+def stream_chat(client, model, messages, **kwargs):
+    for chunk in client.chat.completions.create(model=model, messages=messages,
+                                                stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        piece = chunk.choices[0].delta.content
+        if piece:
+            yield piece
+
+
+# Prints pieces as they arrive and returns the full text.
+# Time to first token goes to stderr when report_ttft is set.
+def print_stream(pieces, report_ttft=False, file=None):
+    file = file or sys.stdout
+    start = time.perf_counter()
+    parts = []
+    for piece in pieces:
+        if not parts and report_ttft:
+            print(f"[first token after {(time.perf_counter() - start) * 1000:.0f} ms]",
+                  file=sys.stderr)
+        parts.append(piece)
+        print(piece, end="", file=file, flush=True)
+    print(file=file)
+    return "".join(parts)
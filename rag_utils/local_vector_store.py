@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import atexit
+import sqlite3
+import threading
+import faiss
+import numpy as np
+
+from rag_utils import index_factory
+
+# VECTOR_BACKEND=local runs the Pinecone scripts against LocalVectorIndex instead of the
+# Pinecone service; data lives under LOCAL_VECTOR_DIR/<index name>/
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_VECTOR_DIR = os.getenv(
+    "LOCAL_VECTOR_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".local_vectors"),
+)
+
+
+def _unit(values):
+    v = np.asarray(values, dtype="float32").ravel()
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+# numpy scalars (e.g. CSV metadata) are stored as JSON numbers, so range filters match them
+def _json_default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+# Pinecone-style metadata filter -> SQL over the JSON metadata:
+#   {"field": value}, {"field": {"$eq" | "$ne" | "$gt" | "$gte" | "$lt" | "$lte" |
+#   "$in" | "$nin" | "$exists": ...}}, {"$and": [...]}, {"$or": [...]}.
+# $eq / $in also match list-valued fields containing the value; $ne / $nin
+# match records without the field, like Pinecone.
+def _filter_sql(filter):
+    clauses, params = [], []
+    for field, cond in filter.items():
+        if field in ("$and", "$or"):
+            parts = [_filter_sql(f) for f in cond]
+            joiner = " AND " if field == "$and" else " OR "
+            clauses.append("(" + (joiner.join(f"({w})" for w, _ in parts) or "1") + ")")
+            for _, p in parts:
+                params += p
+            continue
+        path = '$."' + field.replace('"', '\\"') + '"'
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, value in cond.items():
+            if op in ("$eq", "$ne", "$in", "$nin"):
+                values = list(value) if op in ("$in", "$nin") else [value]
+                any_of = (f"EXISTS (SELECT 1 FROM json_each(vectors.metadata, ?) "
+                          f"WHERE value IN ({','.join('?' * len(values)) or 'NULL'}))")
+                clauses.append(any_of if op in ("$eq", "$in") else f"NOT {any_of}")
+                params += [path, *values]
+            elif op in COMPARISONS:
+                clauses.append(f"json_extract(metadata, ?) {COMPARISONS[op]} ?")
+                params += [path, value]
+            elif op == "$exists":
+                clauses.append(f"json_type(metadata, ?) IS {'NOT ' if value else ''}NULL")
+                params.append(path)
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return " AND ".join(clauses) or "1", params
+
+
+# Local, persistent index with the Pinecone index interface (upsert / query / fetch /
+# delete / list / describe_index_stats, namespaces, metadata). Scores are cosine
+# similarities, like a Pinecone "cosine" index.
+#   vectors.db - SQLite: id, metadata and the vector of every record (source of truth)
+#   <ns>.index - FAISS IndexIDMap2 per namespace, rebuilt from SQLite if out of date
+class LocalVectorIndex:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.path, "vectors.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                namespace TEXT NOT NULL,
+                id TEXT NOT NULL,
+                vid INTEGER NOT NULL,
+                metadata TEXT,
+                vec BLOB NOT NULL,
+                PRIMARY KEY (namespace, id)
+            )
+        """)
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS vectors_vid ON vectors (namespace, vid)")
+        # saved = 1 while <ns>.index matches the table; cleared on every change
+        self._db.execute("CREATE TABLE IF NOT EXISTS index_files (namespace TEXT PRIMARY KEY, saved INTEGER)")
+        self._db.commit()
+        self._indexes = {}  # namespace -> FAISS index
+        self._dirty = set()  # namespaces whose FAISS file is stale
+        atexit.register(self.flush)
+
+    def _index_path(self, namespace):
+        return os.path.join(self.path, re.sub(r"[^A-Za-z0-9_.-]+", "_", namespace or "default") + ".index")
+
+    def _mark(self, namespace, saved):
+        self._db.execute("INSERT OR REPLACE INTO index_files VALUES (?, ?)", (namespace, int(saved)))
+
+    def _count(self, namespace):
+        return self._db.execute("SELECT COUNT(*) FROM vectors WHERE namespace = ?",
+                                (namespace,)).fetchone()[0]
+
+    def _namespace_index(self, namespace, dim=None):
+        index = self._indexes.get(namespace)
+        if index is not None:
+            return index
+        path = self._index_path(namespace)
+        count = self._count(namespace)
+        saved = self._db.execute("SELECT saved FROM index_files WHERE namespace = ?",
+                                 (namespace,)).fetchone()
+        if saved and saved[0] and os.path.exists(path):
+            index = faiss.read_index(path)
+            if index.ntotal != count:
+                index = None
+        # no file, or changes since the last flush (e.g. a crash): rebuild from SQLite
+        if index is None and count:
+            rows = self._db.execute("SELECT vid, vec FROM vectors WHERE namespace = ?",
+                                    (namespace,)).fetchall()
+            vectors = np.stack([np.frombuffer(vec, dtype="float32") for _, vec in rows])
+            index = faiss.IndexIDMap2(index_factory.new_index(vectors.shape[1], "flat", metric="ip"))
+            index.add_with_ids(vectors, np.array([vid for vid, _ in rows], dtype="int64"))
+            self._dirty.add(namespace)
+        if index is None and dim is not None:
+            index = faiss.IndexIDMap2(index_factory.new_index(dim, "flat", metric="ip"))
+        if index is not None:
+            self._indexes[namespace] = index
+        return index
+
+    def upsert(self, vectors, namespace=None):
+        namespace = namespace or ""
+        if not vectors:
+            return {"upserted_count": 0}
+        units = [_unit(v["values"]) for v in vectors]
+        with self._lock:
+            index = self._namespace_index(namespace, dim=len(units[0]))
+            ids = [v["id"] for v in vectors]
+            existing = dict(self._state_for(namespace, ids))
+            next_vid = self._db.execute("SELECT MAX(vid) FROM vectors WHERE namespace = ?",
+                                        (namespace,)).fetchone()[0]
+            next_vid = 0 if next_vid is None else next_vid + 1
+
+            vids, rows = [], []
+            for v, unit in zip(vectors, units):
+                vid = existing.get(v["id"])
+                if vid is None:
+                    vid = existing[v["id"]] = next_vid
+                    next_vid += 1
+                vids.append(vid)
+                rows.append((namespace, v["id"], vid,
+                             json.dumps(v.get("metadata") or {}, default=_json_default), unit.tobytes()))
+            vids = np.array(vids, dtype="int64")
+            # later duplicates of an id in the same request win
+            _, last = np.unique(vids[::-1], return_index=True)
+            keep = np.sort(len(vids) - 1 - last)
+
+            index.remove_ids(vids[keep])
+            index.add_with_ids(np.stack([units[i] for i in keep]), vids[keep])
+            self._db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?, ?)", rows)
+            self._mark(namespace, False)
+            self._db.commit()
+            self._dirty.add(namespace)
+        return {"upserted_count": len(vectors)}
+
+    def _state_for(self, namespace, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), 900):  # SQLite bound-parameter limit
+            part = ids[start:start + 900]
+            yield from self._db.execute(
+                f"SELECT id, vid FROM vectors WHERE namespace = ? AND id IN ({','.join('?' * len(part))})",
+                [namespace, *part]).fetchall()
+
+    def query(self, vector, top_k=10, namespace=None, filter=None, include_metadata=False,
+              include_values=False, **kwargs):
+        namespace = namespace or ""
+        with self._lock:
+            index = self._namespace_index(namespace)
+            if index is None or index.ntotal == 0:
+                return {"matches": [], "namespace": namespace}
+            params = None
+            if filter:
+                where, args = _filter_sql(filter)
+                allowed = [r[0] for r in self._db.execute(
+                    f"SELECT vid FROM vectors WHERE namespace = ? AND {where}", [namespace, *args])]
+                if not allowed:
+                    return {"matches": [], "namespace": namespace}
+                # only eligible vectors are scored
+                params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.array(allowed, dtype="int64")))
+            k = min(top_k, index.ntotal)
+            scores, vids = index.search(_unit(vector).reshape(1, -1), k, params=params)
+            hits = [(int(v), float(s)) for v, s in zip(vids[0], scores[0]) if v >= 0]
+            if not hits:
+                return {"matches": [], "namespace": namespace}
+            rows = self._db.execute(
+                f"SELECT vid, id, metadata, vec FROM vectors WHERE namespace = ? "
+                f"AND vid IN ({','.join('?' * len(hits))})", [namespace, *[v for v, _ in hits]]
+            ).fetchall()
+        by_vid = {vid: (vid_id, metadata, vec) for vid, vid_id, metadata, vec in rows}
+
+        matches = []
+        for vid, score in hits:
+            vid_id, metadata, vec = by_vid[vid]
+            match = {"id": vid_id, "score": score}
+            if include_metadata:
+                match["metadata"] = json.loads(metadata)
+            if include_values:
+                match["values"] = np.frombuffer(vec, dtype="float32").tolist()
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def fetch(self, ids, namespace=None):
+        namespace = namespace or ""
+        ids = list(ids)
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 900):
+                part = ids[start:start + 900]
+                for vid_id, metadata, vec in self._db.execute(
+                        f"SELECT id, metadata, vec FROM vectors WHERE namespace = ? "
+                        f"AND id IN ({','.join('?' * len(part))})", [namespace, *part]):
+                    found[vid_id] = {"id": vid_id, "metadata": json.loads(metadata),
+                                     "values": np.frombuffer(vec, dtype="float32").tolist()}
+        return {"vectors": found, "namespace": namespace}
+
+    def list(self, prefix="", namespace=None, limit=100):
+        with self._lock:
+            ids = [r[0] for r in self._db.execute(
+                "SELECT id FROM vectors WHERE namespace = ? AND substr(id, 1, ?) = ? ORDER BY id",
+                (namespace or "", len(prefix), prefix))]
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def delete(self, ids=None, namespace=None, delete_all=False):
+        namespace = namespace or ""
+        with self._lock:
+            index = self._namespace_index(namespace)
+            if delete_all:
+                self._db.execute("DELETE FROM vectors WHERE namespace = ?", (namespace,))
+                self._indexes.pop(namespace, None)
+                if os.path.exists(self._index_path(namespace)):
+                    os.remove(self._index_path(namespace))
+                self._dirty.discard(namespace)
+            elif ids:
+                vids = [vid for _, vid in self._state_for(namespace, ids)]
+                if index is not None and vids:
+                    index.remove_ids(np.array(vids, dtype="int64"))
+                self._db.executemany("DELETE FROM vectors WHERE namespace = ? AND vid = ?",
+                                     [(namespace, vid) for vid in vids])
+                self._mark(namespace, False)
+                self._dirty.add(namespace)
+            self._db.commit()
+        return {}
+
+    def describe_index_stats(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT namespace, COUNT(*) FROM vectors GROUP BY namespace").fetchall()
+        namespaces = {ns: {"vector_count": n} for ns, n in rows}
+        return {"namespaces": namespaces, "total_vector_count": sum(n for _, n in rows)}
+
+    # Writes changed FAISS indexes to disk (also runs at interpreter exit)
+    def flush(self):
+        with self._lock:
+            for namespace in list(self._dirty):
+                index = self._indexes.get(namespace)
+                if index is not None:
+                    tmp = self._index_path(namespace) + ".tmp"
+                    faiss.write_index(index, tmp)
+                    os.replace(tmp, self._index_path(namespace))
+                    self._mark(namespace, True)
+                self._dirty.discard(namespace)
+            self._db.commit()
+
+
+# The index the Pinecone scripts talk to: a LocalVectorIndex when VECTOR_BACKEND=local,
+# otherwise whatever connect() returns (the Pinecone index)
+def open_index(index_name, connect):
+    if VECTOR_BACKEND == "local":
+        return LocalVectorIndex(os.path.join(LOCAL_VECTOR_DIR, index_name))
+    return connect()
+
+
+# Name for the upload manifest, so local and Pinecone copies are tracked separately
+def manifest_name(index_name):
+    return index_name if VECTOR_BACKEND == "pinecone" else f"{VECTOR_BACKEND}-{index_name}"
@@ -0,0 +1,15 @@
+import threading
+from sentence_transformers import SentenceTransformer
+
+# Process-level registry: each SentenceTransformer is loaded once and shared
+_models = {}
+_lock = threading.Lock()
+
+
+def get_sentence_model(name="all-MiniLM-L6-v2"):
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            model = SentenceTransformer(name)
+            _models[name] = model
+    return model
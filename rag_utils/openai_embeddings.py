@@ -0,0 +1,132 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+# OpenAI limits: 2048 inputs per request, 8191 tokens per input and a
+# request-wide token cap; keep well under them by default.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_INPUT = 8191
+
+
+# (count_tokens, truncate) for the embedding models' tokenizer. truncate cuts a text to
+# MAX_TOKENS_PER_INPUT tokens: the API rejects the whole request if one input is longer.
+def _tokenizer():
+    if tiktoken is None:
+        # ~4 characters per token in English; cut at 3 to stay under the limit
+        return (lambda text: len(text) // 4 + 1,
+                lambda text: text[:MAX_TOKENS_PER_INPUT * 3])
+    enc = tiktoken.get_encoding("cl100k_base")
+
+    def truncate(text):
+        tokens = enc.encode(text, disallowed_special=())
+        return text if len(tokens) <= MAX_TOKENS_PER_INPUT else enc.decode(tokens[:MAX_TOKENS_PER_INPUT])
+    return lambda text: len(enc.encode(text, disallowed_special=())), truncate
+
+
+def _is_retryable(exc):
+    # Works for openai.APIStatusError and for local stubs that set status_code
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Batched, concurrent wrapper around client.embeddings.create.
+# `client` is anything exposing the OpenAI embeddings API (real or fake).
+class EmbeddingClient:
+    def __init__(self, client, model="text-embedding-3-small", batch_size=256,
+                 max_batch_tokens=100_000, max_workers=4, max_retries=6,
+                 base_delay=1.0, max_delay=60.0):
+        self.client = client
+        self.model = model
+        self.batch_size = min(batch_size, MAX_INPUTS_PER_REQUEST)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.count_tokens, self.truncate = _tokenizer()
+
+        # A 429 on one worker pauses all workers until this time
+        self._pause_until = 0.0
+        self._pause_lock = threading.Lock()
+
+    # Greedy packing: start a new batch when either limit would be exceeded.
+    # Texts are expected to be truncated already (embed does it).
+    def make_batches(self, texts):
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            n = min(self.count_tokens(text), MAX_TOKENS_PER_INPUT)
+            if i > start and (i - start >= self.batch_size or tokens + n > self.max_batch_tokens):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += n
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def _wait_for_pause(self):
+        delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, seconds):
+        with self._pause_lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def _embed_batch(self, texts):
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            try:
+                resp = self.client.embeddings.create(model=self.model, input=texts)
+                # Each item carries its input position; don't rely on response order
+                items = sorted(resp.data, key=lambda d: d.index)
+                return np.array([d.embedding for d in items], dtype="float32")
+            except Exception as exc:
+                attempt += 1
+                if attempt > self.max_retries or not _is_retryable(exc):
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                if getattr(exc, "status_code", None) == 429:
+                    self._pause(delay)
+                else:
+                    time.sleep(delay)
+
+    # Returns a float32 array (len(texts), dim) in the same order as texts.
+    # Inputs over MAX_TOKENS_PER_INPUT tokens are embedded from their first tokens.
+    def embed(self, texts):
+        texts = [self.truncate(text) for text in texts]
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+
+        batches = self.make_batches(texts)
+        if len(batches) == 1 or self.max_workers <= 1:
+            parts = [self._embed_batch(texts[s:e]) for s, e in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                parts = list(pool.map(lambda b: self._embed_batch(texts[b[0]:b[1]]), batches))
+        return np.vstack(parts)
+
+    def embed_one(self, text):
+        return self._embed_batch([self.truncate(text)])[0]
@@ -0,0 +1,121 @@
+import os
+import io
+import sys
+import json
+import tempfile
+import subprocess
+
+try:
+    import fitz  # PyMuPDF: much faster text extraction when installed
+except ImportError:
+    fitz = None
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+PAGES_PER_TASK = 16      # pages extracted per worker task
+MIN_PAGES_FOR_POOL = 64  # below this, starting processes costs more than it saves
+
+# Workers are separate `python pdf_ingest.py` processes, not multiprocessing: fork is
+# unsafe once the caller has threads (Streamlit, the retrieval server, torch), and
+# spawn / forkserver re-import the calling script, which here mostly runs its
+# pipeline at import time.
+
+
+# source is a file path or the PDF bytes (e.g. a Streamlit upload)
+def _open(source):
+    if fitz is not None:
+        if isinstance(source, (bytes, bytearray)):
+            return fitz.open(stream=source, filetype="pdf")
+        return fitz.open(source)
+    if PdfReader is None:
+        raise ImportError("PDF extraction needs PyMuPDF (fitz) or pypdf")
+    return PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def page_count(source):
+    doc = _open(source)
+    if fitz is not None:
+        with doc:
+            return doc.page_count
+    return len(doc.pages)
+
+
+# Text of pages [start, stop) as (page_no, text), 1-based, empty pages skipped.
+# Each page is extracted exactly once.
+def extract_pages(source, start=0, stop=None):
+    doc = _open(source)
+    pages = []
+    if fitz is not None:
+        with doc:
+            for i in range(start, doc.page_count if stop is None else stop):
+                text = doc[i].get_text()
+                if text and text.strip():
+                    pages.append((i + 1, text))
+        return pages
+    for i in range(start, len(doc.pages) if stop is None else stop):
+        text = doc.pages[i].extract_text()
+        if text and text.strip():
+            pages.append((i + 1, text))
+    return pages
+
+
+# Worker `index` of `workers`: extracts tasks index, index + workers, ... and writes
+# one JSON line of [[page_no, text], ...] per task. A full pipe blocks the worker,
+# so it never runs far ahead of the reader.
+def _worker_main(path, index, workers):
+    n_pages = page_count(path)
+    for task, start in enumerate(range(0, n_pages, PAGES_PER_TASK)):
+        if task % workers == index:
+            pages = extract_pages(path, start, min(start + PAGES_PER_TASK, n_pages))
+            sys.stdout.write(json.dumps(pages) + "\n")
+            sys.stdout.flush()
+
+
+def _iter_parallel(path, n_tasks, workers):
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), path, str(w), str(workers)],
+                              stdout=subprocess.PIPE, text=True, encoding="utf-8")
+             for w in range(workers)]
+    try:
+        for task in range(n_tasks):  # task t comes from worker t % workers
+            line = procs[task % workers].stdout.readline()
+            if not line:
+                raise RuntimeError(f"PDF worker {task % workers} exited early")
+            for page_no, text in json.loads(line):
+                yield page_no, text
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+
+# Yields (page_no, text) in page order while later pages are still being extracted
+# by worker processes. Workers only run a task or so ahead of the consumer, so memory
+# stays bounded on very large PDFs.
+def iter_pdf_pages(source, workers=PDF_WORKERS):
+    n_pages = page_count(source)
+    ranges = [(s, min(s + PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, PAGES_PER_TASK)]
+    if workers <= 1 or n_pages < MIN_PAGES_FOR_POOL:
+        for start, stop in ranges:
+            yield from extract_pages(source, start, stop)
+        return
+
+    workers = min(workers, len(ranges))
+    if not isinstance(source, (bytes, bytearray)):
+        yield from _iter_parallel(os.path.abspath(source), len(ranges), workers)
+        return
+    # uploads arrive as bytes: workers read them from a temporary file
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield from _iter_parallel(path, len(ranges), workers)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
@@ -0,0 +1,110 @@
+import os
+import re
+import json
+import hashlib
+
+from rag_utils.embedding_cache import normalize_text
+from rag_utils.pinecone_upsert import embed_and_upsert
+
+# Which ids each (index, namespace) already holds, so restarts only upload changes
+# (override with PINECONE_MANIFEST_DIR)
+MANIFEST_DIR = os.getenv(
+    "PINECONE_MANIFEST_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".pinecone_manifest"),
+)
+DELETE_BATCH = 1000  # ids per delete request
+
+
+# Same text + metadata -> same id, so unchanged chunks are recognised across runs
+def content_id(prefix, text, metadata=None):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(normalize_text(text).encode("utf-8"))
+    if metadata:
+        h.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    return f"{prefix}-{h.hexdigest()}"
+
+
+class NamespaceManifest:
+    def __init__(self, index_name, namespace=None, manifest_dir=None):
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{index_name}__{namespace or 'default'}")
+        self.path = os.path.join(manifest_dir or MANIFEST_DIR, safe + ".json")
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, model_name, ids):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": model_name, "ids": sorted(ids)}, f)
+        os.replace(tmp, self.path)  # never leave a half-written manifest
+
+
+def _namespace_count(index, namespace):
+    try:
+        stats = index.describe_index_stats()
+        return stats["namespaces"].get(namespace or "", {}).get("vector_count", 0)
+    except Exception:
+        return None  # unknown: trust the manifest
+
+
+def _delete(index, ids, namespace):
+    ids = list(ids)
+    for i in range(0, len(ids), DELETE_BATCH):
+        if namespace is None:
+            index.delete(ids=ids[i:i + DELETE_BATCH])
+        else:
+            index.delete(ids=ids[i:i + DELETE_BATCH], namespace=namespace)
+
+
+# Ids written by the scripts before content ids existed ("pdf_0", "pdf_1", ...).
+# Only serverless indexes can list ids; elsewhere they are left in place.
+def _legacy_ids(index, legacy_prefix, namespace):
+    try:
+        pages = index.list(prefix=legacy_prefix, namespace=namespace or "")
+        return [vid for page in pages for vid in page]
+    except Exception:
+        return []
+
+
+# Makes the namespace hold exactly `records` ((text, metadata) pairs): only chunks whose
+# content id is not in the local manifest are embedded and upserted, and ids that are
+# no longer produced are deleted. full=True (or PINECONE_FULL_SYNC=1) ignores the manifest.
+def sync_namespace(index, model, model_name, records, index_name, namespace=None, prefix="id",
+                   legacy_prefix=None, full=False, manifest_dir=None, **upsert_kwargs):
+    manifest = NamespaceManifest(index_name, namespace, manifest_dir)
+    previous = manifest.load()
+    full = full or os.getenv("PINECONE_FULL_SYNC") == "1"
+    if previous and previous.get("model") != model_name:
+        full = True  # vectors from another model can't be reused
+    if previous and previous["ids"] and _namespace_count(index, namespace) == 0:
+        full = True  # namespace was emptied / recreated remotely
+    known = set() if full or not previous else set(previous["ids"])
+
+    current = set()
+
+    def new_records():
+        for text, metadata in records:
+            vid = content_id(prefix, text, metadata)
+            if vid in current:
+                continue  # duplicate chunk
+            current.add(vid)
+            if vid not in known:
+                yield vid, text, metadata
+
+    stats = embed_and_upsert(index, model, model_name, new_records(), namespace=namespace,
+                             **upsert_kwargs)
+
+    stale = (set(previous["ids"]) if previous else set()) - current
+    if previous is None and legacy_prefix:
+        stale.update(_legacy_ids(index, legacy_prefix, namespace))
+    _delete(index, stale, namespace)
+    manifest.save(model_name, current)
+
+    stats.update({"total": len(current), "added": stats["vectors"],
+                  "unchanged": len(current) - stats["vectors"], "deleted": len(stale)})
+    return stats
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from rag_utils.batch_query import iter_chunks
+from rag_utils.embedding_cache import cached_encode
+
+# Pinecone accepts up to 1000 vectors / 2 MB per upsert request and recommends ~100
+UPSERT_BATCH_SIZE = int(os.getenv("PINECONE_UPSERT_BATCH", "100"))
+UPSERT_WORKERS = int(os.getenv("PINECONE_UPSERT_WORKERS", "4"))
+MAX_REQUEST_BYTES = 1_800_000  # headroom under the 2 MB request limit
+ENCODE_BATCH = 1024  # texts encoded per call while uploads of earlier batches run
+
+
+def _is_retryable(exc):
+    # Pinecone API errors carry .status; stubs may use .status_code
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    return any(word in name for word in ("Timeout", "Connection", "Protocol", "MaxRetry"))
+
+
+def _vector_bytes(vector):
+    # rough JSON size: ~12 bytes per float plus id and metadata
+    return (12 * len(vector["values"]) + len(vector["id"]) + 64
+            + len(json.dumps(vector.get("metadata") or {}, default=str)))
+
+
+# Groups vectors into requests of at most batch_size vectors and max_bytes bytes
+def iter_upsert_batches(vectors, batch_size=UPSERT_BATCH_SIZE, max_bytes=MAX_REQUEST_BYTES):
+    batch, size = [], 0
+    for vector in vectors:
+        nbytes = _vector_bytes(vector)
+        if batch and (len(batch) >= batch_size or size + nbytes > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(vector)
+        size += nbytes
+    if batch:
+        yield batch
+
+
+def _upsert_with_retry(index, batch, namespace, max_retries, base_delay, max_delay):
+    for attempt in range(max_retries + 1):
+        try:
+            if namespace is None:
+                return index.upsert(vectors=batch)
+            return index.upsert(vectors=batch, namespace=namespace)
+        except Exception as e:
+            if attempt == max_retries or not _is_retryable(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * (0.5 + random.random() / 2))
+
+
+# Upserts an iterable of {"id", "values", "metadata"} dicts in size-bounded batches,
+# max_workers requests in flight. The iterable is consumed lazily, so vectors can be
+# produced (e.g. encoded) while earlier batches upload. Returns throughput stats.
+def bulk_upsert(index, vectors, namespace=None, batch_size=UPSERT_BATCH_SIZE,
+                max_workers=UPSERT_WORKERS, max_retries=5, base_delay=0.5, max_delay=30.0,
+                max_bytes=MAX_REQUEST_BYTES):
+    start = time.perf_counter()
+    total, batches = 0, 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = deque()
+        for batch in iter_upsert_batches(vectors, batch_size, max_bytes):
+            if len(in_flight) >= 2 * max_workers:
+                in_flight.popleft().result()  # raises if a batch failed for good
+            in_flight.append(pool.submit(_upsert_with_retry, index, batch, namespace,
+                                         max_retries, base_delay, max_delay))
+            total += len(batch)
+            batches += 1
+        for future in in_flight:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    return {"vectors": total, "batches": batches, "seconds": round(elapsed, 3),
+            "vectors_per_sec": round(total / elapsed, 1) if elapsed else 0.0}
+
+
+# Encodes (id, text, metadata) records in large batches and upserts them.
+# The text is stored as metadata["text"], like the scripts always did.
+def embed_and_upsert(index, model, model_name, records, namespace=None,
+                     encode_batch=ENCODE_BATCH, **upsert_kwargs):
+    def vectors():
+        for chunk in iter_chunks(records, encode_batch):
+            embeddings = cached_encode(model, model_name, [text for _, text, _ in chunk])
+            for (vid, text, metadata), emb in zip(chunk, embeddings):
+                yield {"id": vid, "values": emb.tolist(), "metadata": {"text": text, **(metadata or {})}}
+    return bulk_upsert(index, vectors(), namespace=namespace, **upsert_kwargs)
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import faiss
+
+from rag_utils import index_factory
+
+# Per-model similarity thresholds (cosine), calibrated once per embedding model
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "similarity_thresholds.json")
+
+
+# Unit-length float32 copy, so inner product == cosine similarity
+def normalize(vectors):
+    vectors = np.array(vectors, dtype="float32", copy=True, ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+# Inner-product index over normalized vectors: search scores are true cosines
+def build_cosine_index(embeddings, kind=None):
+    return index_factory.build_index(normalize(embeddings), kind=kind, metric="ip")
+
+
+# Returns (cosine scores, ids); scores are in [-1, 1], higher is more similar
+def cosine_search(index, queries, k, nprobe=None, ef_search=None):
+    return index_factory.search(index, normalize(queries), k, nprobe=nprobe, ef_search=ef_search)
+
+
+# ================= THRESHOLDS =================
+def load_thresholds(path=THRESHOLDS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_threshold(model_name, name, default=0.5, path=THRESHOLDS_PATH):
+    return load_thresholds(path).get(model_name, {}).get(name, default)
+
+
+def save_threshold(model_name, name, value, path=THRESHOLDS_PATH):
+    thresholds = load_thresholds(path)
+    thresholds.setdefault(model_name, {})[name] = round(float(value), 4)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(thresholds, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+# Threshold that best separates relevant from irrelevant cosine scores (max F1)
+def calibrate_threshold(positive_scores, negative_scores):
+    pos = np.asarray(positive_scores, dtype="float64")
+    neg = np.asarray(negative_scores, dtype="float64")
+    best_t, best_f1 = 0.5, -1.0
+    for t in np.unique(np.concatenate([pos, neg])):
+        tp = np.sum(pos >= t)
+        fp = np.sum(neg >= t)
+        fn = len(pos) - tp
+        f1 = 2 * tp / float(2 * tp + fp + fn) if tp else 0.0
+        if f1 > best_f1:
+            best_t, best_f1 = float(t), float(f1)
+    return best_t, best_f1
+
+
+# CLI: calibrate from a JSONL file of {"query": ..., "text": ..., "relevant": true/false}
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate a cosine threshold for a model")
+    parser.add_argument("pairs", help="JSONL with query, text and relevant fields")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--name", required=True, help="threshold name, e.g. faiss_csv")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    with open(args.pairs, "r", encoding="utf-8") as f:
+        pairs = [json.loads(line) for line in f if line.strip()]
+    model = SentenceTransformer(args.model)
+    q = normalize(model.encode([p["query"] for p in pairs], convert_to_numpy=True))
+    t = normalize(model.encode([p["text"] for p in pairs], convert_to_numpy=True))
+    scores = np.sum(q * t, axis=1)
+
+    labels = np.array([bool(p["relevant"]) for p in pairs])
+    threshold, f1 = calibrate_threshold(scores[labels], scores[~labels])
+    save_threshold(args.model, args.name, threshold)
+    print(f"✅ {args.model} / {args.name}: threshold = {threshold:.4f} (F1 = {f1:.3f})")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from rag_utils.fake_openai import FakeOpenAI
+from rag_utils.openai_embeddings import EmbeddingClient
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MAX_BODY_BYTES = 1_000_000
+
+
+#  1. Latency tracking
+
+class LatencyStats:
+    def __init__(self, window=10_000):
+        self.samples = deque(maxlen=window)  # recent latencies in seconds
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        result = {"count": self.count, "errors": self.errors,
+                  "timeouts": self.timeouts, "rejected": self.rejected}
+        if self.samples:
+            ms = np.array(self.samples) * 1000
+            for p in (50, 90, 99):
+                result[f"p{p}_ms"] = round(float(np.percentile(ms, p)), 2)
+            result["max_ms"] = round(float(ms.max()), 2)
+        return result
+
+
+#  2. Minimal HTTP/1.1 on asyncio streams
+
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = header.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+           503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+async def write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+#  3. Server: warm backends, bounded concurrency, timeouts, load shedding
+
+class RetrievalServer:
+    def __init__(self, backends, workers=8, max_pending=64, timeout=10.0):
+        self.backends = backends  # name -> callable(payload dict) -> JSON-able result
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0  # requests queued or running in the pool
+        self._pending_lock = threading.Lock()
+        self.stats = {name: LatencyStats() for name in backends}
+
+    def _run(self, backend, payload):
+        try:
+            return backend(payload)
+        finally:
+            # decremented when the work really ends, even after a client timeout
+            with self._pending_lock:
+                self.pending -= 1
+
+    async def search(self, name, payload):
+        stats = self.stats[name]
+
+        # Backpressure: shed load instead of queueing without bound
+        if self.pending >= self.max_pending:
+            stats.rejected += 1
+            return 503, {"error": "server busy, retry later"}
+
+        timeout = min(float(payload.get("timeout", self.timeout)), self.timeout)
+        loop = asyncio.get_running_loop()
+        with self._pending_lock:
+            self.pending += 1
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self.pool, self._run, self.backends[name], payload), timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            return 504, {"error": f"timed out after {timeout}s"}
+        except Exception as e:
+            stats.errors += 1
+            return 500, {"error": f"{e.__class__.__name__}: {e}"}
+
+        elapsed = time.perf_counter() - start
+        stats.record(elapsed)
+        return 200, {"results": result, "latency_ms": round(elapsed * 1000, 2)}
+
+    async def dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "backends": sorted(self.backends)}
+        if method == "GET" and path == "/stats":
+            result = {"pending": self.pending,
+                      "backends": {n: s.summary() for n, s in self.stats.items()}}
+            # Backends with their own counters (e.g. the query encode scheduler)
+            extra = {n: b.stats() for n, b in self.backends.items() if hasattr(b, "stats")}
+            if extra:
+                result["backend_internals"] = extra
+            return 200, result
+        if method == "POST" and path.startswith("/search/"):
+            name = path[len("/search/"):]
+            if name not in self.backends:
+                return 404, {"error": f"unknown backend '{name}'"}
+            try:
+                payload = json.loads(body or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("request body must be a JSON object")
+                if not str(payload.get("query", "")).strip():
+                    raise ValueError("'query' is required")
+                if not isinstance(payload.get("filters") or {}, dict):
+                    raise ValueError("'filters' must be an object")
+                try:
+                    timeout = float(payload.get("timeout", self.timeout))
+                except (TypeError, ValueError):
+                    raise ValueError("'timeout' must be a number")
+                if not timeout > 0:
+                    raise ValueError("'timeout' must be positive")
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            return await self.search(name, payload)
+        return 404, {"error": "not found"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    await write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(method, path, body)
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"✅ Retrieval server listening on http://{host}:{port} "
+              f"(backends: {', '.join(sorted(self.backends))})")
+        async with server:
+            await server.serve_forever()
+
+
+#  4. Backends built on the existing search functions (loaded once, kept warm)
+
+# Import a query script as a module, from its own directory (they use relative paths)
+def load_script(path, module_name):
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+def make_hybrid_backend(corpus_path):
+    import rag_app
+    from rag_utils.model_registry import get_sentence_model
+    from rag_utils.encode_scheduler import get_encode_scheduler
+
+    model = get_sentence_model(rag_app.EMBED_MODEL)
+    with open(corpus_path, "rb") as f:
+        _, chunks, pages = rag_app.extract_chunks(f)
+    index, _ = rag_app.create_faiss_index(chunks, model)
+    keyword_index = rag_app.create_keyword_index(chunks)
+    print(f"📄 hybrid: {len(chunks)} chunks from {corpus_path}")
+
+    encoder = get_encode_scheduler(model)
+
+    def search(payload):
+        hits = rag_app.hybrid_search(payload["query"], chunks, model, index, keyword_index,
+                                     top_k=int(payload.get("top_k", 3)))
+        return [{"chunk_id": h.chunk_id, "score": h.score, "source_scores": h.source_scores,
+                 "page": pages[h.chunk_id] if pages else None,
+                 "text": chunks[h.chunk_id]} for h in hits]
+    search.stats = lambda: {"encoder": encoder.stats()}
+    return search
+
+
+def make_csv_backend(llm_client=None):
+    module = load_script(os.path.join(ROOT, "faiss", "csv", "hybrid_query_with_csv_data.py"),
+                         "faiss_csv_query")
+    if llm_client is not None:
+        module.client = llm_client
+
+    def search(payload):
+        return module.hybrid_query_batch([payload["query"]], fallback=bool(payload.get("answer")))[0]
+    search.stats = lambda: {"answer_cache": module.answer_cache.stats()}
+    return search
+
+
+def make_trainings_backend(llm_client=None):
+    module = load_script(os.path.join(ROOT, "faiss", "mongoDB", "query_trainings.py"),
+                         "trainings_query")
+    if llm_client is not None:
+        module.client = llm_client
+        module.embedder = EmbeddingClient(llm_client, model="text-embedding-3-small")
+
+    def search(payload):
+        # filters: {"technology": ..., "company": ..., "trainer": ..., "date_from": ..., "date_to": ...}
+        records, _, _ = module.search_and_dedup(payload["query"], raw_k=int(payload.get("raw_k", 10)),
+                                                filters=payload.get("filters"))
+        result = {"records": records}
+        if payload.get("answer"):
+            result["summary"] = (module.generate_llm_summary(payload["query"], records)
+                                 if records else "No matching trainings found.")
+        return result
+    search.stats = lambda: {"summary_cache": module.summary_cache.stats()}
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the RAG search functions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--backends", default="hybrid",
+                        help="comma-separated: hybrid, csv, trainings")
+    parser.add_argument("--corpus", help="file (.txt/.csv/.pdf) for the hybrid backend")
+    parser.add_argument("--workers", type=int, default=8, help="threads running searches")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="requests in flight before new ones get 503")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout (s)")
+    parser.add_argument("--stub-llm", action="store_true",
+                        help="use the offline fake OpenAI client (no API key / network)")
+    args = parser.parse_args()
+
+    llm_client = None
+    if args.stub_llm:
+        os.environ.setdefault("OPENAI_API_KEY", "stub-key")  # scripts refuse to start without one
+        llm_client = FakeOpenAI()
+
+    backends = {}
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        if name == "hybrid":
+            if not args.corpus:
+                parser.error("--corpus is required for the hybrid backend")
+            backends[name] = make_hybrid_backend(args.corpus)
+        elif name == "csv":
+            backends[name] = make_csv_backend(llm_client)
+        elif name == "trainings":
+            backends[name] = make_trainings_backend(llm_client)
+        else:
+            parser.error(f"unknown backend: {name}")
+
+    server = RetrievalServer(backends, workers=args.workers, max_pending=args.max_pending,
+                             timeout=args.timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 Bye")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag_utils.csv_ingest import iter_csv_rows
+
+CSV = """id,name,score,year
+1,alpha,1.5,2020
+2,beta,,2021
+3,,2.0,
+4,delta,3,2023
+5,epsilon,,2024
+"""
+
+
+def render(path, chunksize, **kwargs):
+    texts, metadata = [], []
+    for batch in iter_csv_rows(str(path), chunksize=chunksize, **kwargs):
+        texts.extend(batch.texts)
+        metadata.extend(batch.metadata or [])
+    return texts, metadata
+
+
+def test_rendering_does_not_depend_on_chunk_size(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text(CSV)
+
+    for skip_na in (True, False):
+        kwargs = {"metadata_columns": ["year", "score"], "text_columns": ["id", "name", "year"],
+                  "skip_na": skip_na}
+        assert render(path, 2, **kwargs) == render(path, 1000, **kwargs)
+
+    texts, metadata = render(path, 2, metadata_columns=["year", "score"],
+                             text_columns=["id", "name", "year"])
+    assert texts[2] == "id: 3"
+    assert texts[3] == "id: 4 | name: delta | year: 2023"
+    assert metadata[1] == {"year": 2021, "score": None}
+    assert metadata[2] == {"year": None, "score": 2.0}
+
+    texts, _ = render(path, 2, skip_na=False, with_names=False, sep=" ")
+    assert texts[1] == "2 beta nan 2021"
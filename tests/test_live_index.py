@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "faiss", "mongoDB"))
+sys.path.insert(0, ROOT)
+
+from bson import ObjectId
+from rag_utils.fake_openai import FakeOpenAI
+from rag_utils.openai_embeddings import EmbeddingClient
+from trainings_sync import TrainingsIndex
+from live_index import LiveTrainingsIndex, ChangeWatcher
+
+
+# Applies a {"$project": {"a.b": 1}} stage the way MongoDB does: only the listed
+# paths survive, plus the top-level _id
+def project(event, projection):
+    out = {"_id": event["_id"]}
+    for path in projection:
+        head, _, rest = path.partition(".")
+        if head not in event:
+            continue
+        if not rest:
+            out[head] = event[head]
+        elif rest in event[head]:
+            out.setdefault(head, {})[rest] = event[head][rest]
+    return out
+
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = list(events)
+        self.alive = True
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        self.alive = False
+
+    def try_next(self):
+        return self.events.pop(0) if self.events else None
+
+
+class FakeCollection:
+    def __init__(self, events):
+        self.events = events
+        self.rescans = 0
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        projection = pipeline[0]["$project"]
+        stream = FakeStream(project(e, projection) for e in self.events)
+        self.events = []
+        return stream
+
+    def find(self, *args, **kwargs):
+        self.rescans += 1
+        raise AssertionError("the watcher fell back to a full rescan")
+
+
+def test_projected_change_event_updates_index_without_rescan(tmp_path):
+    store = TrainingsIndex.load(str(tmp_path / "t.index"), str(tmp_path / "t.db"))
+    live = LiveTrainingsIndex(store, EmbeddingClient(FakeOpenAI(), max_workers=1),
+                              publish_interval=0)
+
+    doc_id = ObjectId()
+    doc = {"_id": doc_id, "trainingName": "Kafka Streams", "technology": "Kafka",
+           "companyName": "Acme", "trainerName": "Ravi", "internalNotes": "not indexed"}
+    collection = FakeCollection([{"_id": {"_data": "1"}, "operationType": "insert",
+                                  "documentKey": {"_id": doc_id}, "fullDocument": doc}])
+
+    watcher = ChangeWatcher(live, collection, batch_window=0.05, poll_interval=60)
+    watcher.start()
+    deadline = time.monotonic() + 5
+    while store.metadata.count() == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    watcher.stop()
+    watcher.join(timeout=5)
+
+    assert watcher.mode == "change_stream"
+    assert not watcher._needs_resync
+    assert collection.rescans == 0
+    assert store.metadata.count() == 1
+    assert live.snapshot is not None and live.snapshot.ntotal == 1
+
+    record = store.metadata.get_many([0])[0]
+    assert record["_id"] == str(doc_id)
+    assert record["trainingName"] == "Kafka Streams"
+    assert "internalNotes" not in record
+
+
+def test_batches_within_publish_interval_share_one_index_copy(tmp_path):
+    store = TrainingsIndex.load(str(tmp_path / "t.index"), str(tmp_path / "t.db"))
+    live = LiveTrainingsIndex(store, EmbeddingClient(FakeOpenAI(), max_workers=1),
+                              publish_interval=60)
+
+    live.apply([{"_id": ObjectId(), "trainingName": "Kafka"}], [])
+    live.apply([{"_id": ObjectId(), "trainingName": "Spark"}], [])
+    assert live.snapshot is None  # nothing published yet
+    live.publish()
+    assert live.snapshot is None  # still within the interval
+
+    live.publish(force=True)
+    assert live.snapshot.ntotal == 2